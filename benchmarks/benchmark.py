@@ -0,0 +1,416 @@
+"""
+Benchmark the parsing and call rate limiter hot paths of pykrakenapi.
+
+The query methods ``get_recent_trades``, ``get_ohlc_data``,
+``get_order_book``, ``get_order_book_arrays`` and ``get_closed_orders`` are
+called with synthetic Kraken API responses of ``size`` rows (e.g. ``--size
+1000 100000 1000000``), served by a transport that does not touch the network,
+so that only the conversion of the responses (e.g. to DataFrames) and the
+overhead of the decorators is measured. The responses are generated once per
+size, with a fixed random seed, before the timed calls. Closed orders are only
+benchmarked up to ``max_closed_orders`` rows.
+
+The ``limiter`` benchmarks measure the overhead of the decorators of the query
+methods (call rate limiter, retries and, if available, query coalescing) on
+``get_server_time``, called ``calls`` times by each number of ``threads``
+sharing one KrakenAPI instance. With ``tier`` 0 the limit is never reached.
+The ``limiter_throttled`` benchmark uses ``tier`` 4 without sleeping
+(``crl_sleep=0``), so that all but the first 20 calls are rejected with a
+CallRateLimitError, and the ``limiter_wait`` benchmark measures how long a
+call that reached the limit waits (with the default ``crl_sleep``) until it is
+admitted. The ``import`` benchmark measures the time of ``import pykrakenapi``
+in a fresh interpreter.
+
+Benchmarks of features that the checkout does not have yet (e.g.
+``get_order_book_arrays`` or query coalescing) are skipped, so that older
+commits can be benchmarked with the same script.
+
+Each benchmark is run ``repeat`` times (with the garbage collector disabled),
+the minimum, median and mean durations are reported, in seconds. The
+pykrakenapi package of this checkout is benchmarked (not an installed one).
+
+Results are stored as JSON (see ``output``), together with the git commit of
+the checkout and the versions of python, pandas and numpy, so that runs of
+different commits can be compared, e.g.
+
+    $ git checkout master
+    $ python benchmarks/benchmark.py --output master.json
+    $ git checkout feature
+    $ python benchmarks/benchmark.py --compare master.json
+
+Note that 1000000 rows of closed orders need several GB of memory and take
+minutes per call (raise ``max_closed_orders`` to run them anyway), and that
+``limiter_wait`` sleeps up to ``crl_sleep`` seconds per run.
+
+"""
+
+import argparse
+import contextlib
+import datetime
+import gc
+import inspect
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# benchmark the pykrakenapi package of this checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pykrakenapi import KrakenAPI  # noqa: E402
+from pykrakenapi.pykrakenapi import CallRateLimitError  # noqa: E402
+
+PAIR = 'XXBTZEUR'
+BENCHMARKS = ['trades', 'ohlc', 'book', 'book_arrays', 'closed_orders',
+              'limiter', 'limiter_coalesce', 'limiter_throttled',
+              'limiter_wait', 'import']
+
+# features of this checkout (older commits lack some of them)
+FEATURES = {
+    'book_arrays': hasattr(KrakenAPI, 'get_order_book_arrays'),
+    'limiter_coalesce': 'coalesce' in inspect.signature(
+        KrakenAPI.__init__).parameters,
+}
+
+# parser
+parser = argparse.ArgumentParser(
+    description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+)
+
+parser.add_argument(
+    '--benchmark',
+    help='benchmark(s) to run (default: all)',
+    type=str,
+    nargs='+',
+    choices=BENCHMARKS,
+    default=BENCHMARKS)
+
+parser.add_argument(
+    '--size',
+    help='number of rows of the synthetic responses (default: %(default)s)',
+    type=int,
+    nargs='+',
+    default=[1000, 100000, 1000000])
+
+parser.add_argument(
+    '--max-closed-orders',
+    help=('largest size of the closed_orders benchmark, larger sizes are '
+          'skipped (default: %(default)s)'),
+    type=int,
+    default=100000)
+
+parser.add_argument(
+    '--repeat',
+    help='number of runs of each benchmark (default: %(default)s)',
+    type=int,
+    default=3)
+
+parser.add_argument(
+    '--calls',
+    help=('number of calls per thread of the limiter benchmarks '
+          '(default: %(default)s)'),
+    type=int,
+    default=10000)
+
+parser.add_argument(
+    '--threads',
+    help=('number(s) of threads of the limiter benchmarks '
+          '(default: %(default)s)'),
+    type=int,
+    nargs='+',
+    default=[1, 4])
+
+parser.add_argument(
+    '--output',
+    help='store the results as JSON in this file',
+    type=str,
+    default=None)
+
+parser.add_argument(
+    '--compare',
+    help=('compare the results to the results of another run (a JSON file, '
+          'see output)'),
+    type=str,
+    default=None)
+
+parser.add_argument(
+    '--seed',
+    help='random seed of the synthetic responses (default: %(default)s)',
+    type=int,
+    default=0)
+
+# args
+args = parser.parse_args()
+
+
+class PayloadAPI(object):
+    """Transport answering each method with a fixed response."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def query_public(self, method, data=None, timeout=None):
+        return self.responses[method]
+
+    def query_private(self, method, data=None, timeout=None):
+        self._nonce()
+        return self.responses[method]
+
+    def _nonce(self):
+        return int(1000*time.time())
+
+
+# response of get_server_time (the query of the limiter benchmarks)
+TIME = {'error': [], 'result': {'unixtime': 1500000000,
+                                'rfc1123': 'Fri, 14 Jul 17 02:40:00 +0000'}}
+
+
+def responses(size, seed, closed_orders=True):
+
+    # synthetic responses of ``size`` rows, in the format of the Kraken API
+    # (closed orders only if ``closed_orders``)
+    rng = np.random.RandomState(seed)
+    start = 1500000000
+
+    times = start + np.sort(rng.uniform(0, size, size))
+    prices = 5000 * np.exp(np.cumsum(rng.normal(0, 1e-4, size)))
+    volumes = rng.exponential(.5, size)
+    sides = rng.choice(['b', 's'], size)
+    kinds = rng.choice(['l', 'm'], size)
+
+    prices_s = ['{:.1f}'.format(p) for p in prices]
+    volumes_s = ['{:.8f}'.format(v) for v in volumes]
+    times_l = times.round(4).tolist()
+    itimes = times.astype(int).tolist()
+
+    trades = [[p, v, t, s, k, ''] for p, v, t, s, k in
+              zip(prices_s, volumes_s, times_l, sides, kinds)]
+
+    ohlc = [[start + 60*i, p, p, p, p, p, v, int(c)] for i, (p, v, c) in
+            enumerate(zip(prices_s, volumes_s, rng.poisson(5, size)))]
+
+    asks = [[p, v, t] for p, v, t in zip(prices_s, volumes_s, itimes)]
+    bids = [[p, v, t] for p, v, t in zip(prices_s, volumes_s, itimes)]
+
+    closed = {}
+    for i, (p, v, t) in enumerate(zip(prices_s, volumes_s, times_l)):
+        if not closed_orders:
+            break
+        closed['O{:07d}'.format(i)] = {
+            'refid': None, 'userref': 0, 'status': 'closed',
+            'reason': None, 'opentm': t - 1, 'closetm': t, 'starttm': 0,
+            'expiretm': 0,
+            'descr': {'pair': PAIR, 'type': 'buy' if i % 2 else 'sell',
+                      'ordertype': 'limit', 'price': p, 'price2': '0',
+                      'leverage': 'none',
+                      'order': 'buy {} {} @ limit {}'.format(v, PAIR, p),
+                      'close': ''},
+            'vol': v, 'vol_exec': v, 'cost': p, 'fee': '0.00000',
+            'price': p, 'stopprice': '0.00000', 'limitprice': '0.00000',
+            'misc': '', 'oflags': 'fciq'}
+
+    return {
+        'Time': TIME,
+        'Trades': {'error': [], 'result': {PAIR: trades,
+                                           'last': str(int(times[-1]*1e9))}},
+        'OHLC': {'error': [], 'result': {PAIR: ohlc,
+                                         'last': start + 60*(size - 1)}},
+        'Depth': {'error': [], 'result': {PAIR: {'asks': asks,
+                                                 'bids': bids}}},
+        'ClosedOrders': {'error': [], 'result': {'closed': closed,
+                                                 'count': size}},
+    }
+
+
+def measure(func, repeat):
+
+    # durations of ``repeat`` calls of func, garbage collector disabled
+    durations = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    return durations
+
+
+def limiter(threads, calls, tier=0, coalesce=False):
+
+    # ``threads`` threads each calling a query ``calls`` times (calls
+    # rejected by the call rate limiter are counted as calls)
+    kwargs = {'coalesce': True} if coalesce else {}
+    k = KrakenAPI(PayloadAPI({'Time': TIME}), tier=tier, retry=0,
+                  crl_sleep=0, **kwargs)
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(calls):
+            try:
+                k.get_server_time()
+            except CallRateLimitError:
+                pass
+
+    def run():
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        for worker in workers:
+            worker.join()
+        barrier.reset()
+
+    return run
+
+
+def limiter_wait():
+
+    # seconds a call waits once the limit (of tier 4) is reached
+    k = KrakenAPI(PayloadAPI({'Time': TIME}), tier=4, retry=0, crl_sleep=0)
+    while True:
+        try:
+            k.get_server_time()
+        except CallRateLimitError:
+            break
+    k.crl_sleep = inspect.signature(
+        KrakenAPI.__init__).parameters['crl_sleep'].default
+    start = time.perf_counter()
+    # silence the messages of crl_sleep
+    with contextlib.redirect_stdout(io.StringIO()):
+        k.get_server_time()
+
+    return time.perf_counter() - start
+
+
+def import_time():
+
+    # time of ``import pykrakenapi`` in a fresh interpreter
+    code = ('import time; start = time.perf_counter(); import pykrakenapi; '
+            'print(time.perf_counter() - start)')
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.check_output([sys.executable, '-c', code], env=env,
+                                  cwd=ROOT)
+    return float(out)
+
+
+def git(*cmd):
+
+    try:
+        return subprocess.check_output(
+            ('git',) + cmd, cwd=ROOT, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(name, size, durations, unit=None):
+
+    return {'benchmark': name, 'size': size, 'repeat': len(durations),
+            'min': min(durations), 'median': statistics.median(durations),
+            'mean': statistics.mean(durations), 'unit': unit}
+
+
+# run benchmarks
+results = []
+parsers = {
+    'trades': lambda k: k.get_recent_trades(PAIR),
+    'ohlc': lambda k: k.get_ohlc_data(PAIR),
+    'book': lambda k: k.get_order_book(PAIR),
+    'book_arrays': lambda k: k.get_order_book_arrays(PAIR),
+    'closed_orders': lambda k: k.get_closed_orders(),
+}
+for name, available in FEATURES.items():
+    if name in args.benchmark and not available:
+        print(name, 'skipped (not available in this checkout)', flush=True)
+selected = [name for name in parsers if name in args.benchmark and
+            FEATURES.get(name, True)]
+
+if len(selected) > 0:
+    for size in args.size:
+        closed_orders = size <= args.max_closed_orders
+        if 'closed_orders' in selected and not closed_orders:
+            print('closed_orders', size, 'skipped (see --max-closed-orders)',
+                  flush=True)
+        k = KrakenAPI(PayloadAPI(responses(size, args.seed, closed_orders)),
+                      tier=0, retry=0, crl_sleep=0)
+        for name in selected:
+            if name == 'closed_orders' and not closed_orders:
+                continue
+            durations = measure(lambda: parsers[name](k), args.repeat)
+            results.append(record(name, size, durations, unit='rows'))
+            print(name, size, min(durations), flush=True)
+        del k
+        gc.collect()
+
+for name, tier, coalesce in [('limiter', 0, False),
+                             ('limiter_coalesce', 0, True),
+                             ('limiter_throttled', 4, False)]:
+    if name in args.benchmark and FEATURES.get(name, True):
+        for threads in args.threads:
+            durations = measure(limiter(threads, args.calls, tier, coalesce),
+                                args.repeat)
+            # per call
+            durations = [d / (threads * args.calls) for d in durations]
+            results.append(record(name, threads, durations, unit='threads'))
+            print(name, threads, min(durations), flush=True)
+
+if 'limiter_wait' in args.benchmark:
+    durations = [limiter_wait() for _ in range(args.repeat)]
+    results.append(record('limiter_wait', None, durations))
+    print('limiter_wait', min(durations), flush=True)
+
+if 'import' in args.benchmark:
+    durations = [import_time() for _ in range(args.repeat)]
+    results.append(record('import', None, durations))
+    print('import', min(durations), flush=True)
+
+run = {
+    'commit': git('rev-parse', 'HEAD'),
+    'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+    'time': datetime.datetime.now().isoformat(),
+    'python': platform.python_version(),
+    'pandas': pd.__version__,
+    'numpy': np.__version__,
+    'platform': platform.platform(),
+    'cpus': os.cpu_count(),
+    'seed': args.seed,
+    'results': results,
+}
+
+if args.output is not None:
+    with open(args.output, 'w') as f:
+        json.dump(run, f, indent=2)
+
+# summary (and comparison)
+table = pd.DataFrame(results, columns=['benchmark', 'size', 'unit', 'repeat',
+                                       'min', 'median', 'mean'])
+if args.compare is not None:
+    with open(args.compare) as f:
+        base = json.load(f)
+    base_table = pd.DataFrame(base['results'],
+                              columns=['benchmark', 'size', 'min'])
+    base_table = base_table.rename(columns={'min': 'base_min'})
+    table = table.merge(base_table, on=['benchmark', 'size'], how='left')
+    table['ratio'] = table['min'] / table['base_min']
+    print('\ncompared to commit {} ({})'.format(base['commit'],
+                                                base['time']))
+
+table['size'] = table['size'].astype('Int64')
+print('\ncommit {}{}'.format(run['commit'],
+                             ' (dirty)' if run['dirty'] else ''))
+print(table.to_string(index=False))
@@ -70,8 +70,15 @@ dtime
 from __future__ import absolute_import
 
 from pykrakenapi.pykrakenapi import KrakenAPI
-
-__all__ = ['KrakenAPI']
+from pykrakenapi.clock import ServerClock
+from pykrakenapi.ohlc import OHLCCache
+from pykrakenapi.orderbook import OrderBook
+from pykrakenapi.orders import OrderTracker
+from pykrakenapi.pollers import SpreadPoller, TickerPoller
+from pykrakenapi.timeline import Timeline
+
+__all__ = ['KrakenAPI', 'OHLCCache', 'OrderBook', 'OrderTracker',
+           'ServerClock', 'SpreadPoller', 'TickerPoller', 'Timeline']
 __version__ = '0.1.0'
 __author__ = "Dominik Traxl <dominik.traxl@posteo.org>"
 __copyright__ = "Copyright 2017 Dominik Traxl"
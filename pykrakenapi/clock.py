@@ -0,0 +1,179 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Local estimate of the Kraken server time.
+
+This module contains the class ``ServerClock``, which estimates the offset
+between the local clock and the Kraken server clock from occasional
+``KrakenAPI.get_server_time`` queries, so that the server time can be
+computed locally.
+
+>>> help(ServerClock)
+
+"""
+
+import collections
+import datetime
+import threading
+import time
+
+
+class ServerClock(object):
+    """Estimate of the Kraken server time, computed locally.
+
+    Each sample queries ``KrakenAPI.get_server_time`` and records the local
+    times the query was sent and received. As the server time is reported in
+    whole seconds, a sample only bounds the offset (server time - local time)
+    to the interval (unixtime - received, unixtime + 1 - sent). The offset is
+    estimated as the midpoint of the intersection of the intervals of the
+    recent samples, which narrows with every sample and is mostly determined
+    by the samples with the lowest round trip time. If the intervals do not
+    intersect (e.g. the local clock was adjusted), the midpoint of the sample
+    with the lowest round trip time is used, as in NTP.
+
+    ``server_now`` only queries the server when the estimate is older than
+    ``interval`` seconds (or there are no samples yet).
+
+    Parameters
+    ----------
+    k : KrakenAPI
+        The KrakenAPI instance used to query the server time. Coalescing of
+        queries (see ``coalesce`` in ``KrakenAPI``) should be disabled, as a
+        coalesced query is sent before it is recorded as sent.
+
+    samples : int, optional (default=8)
+        Number of most recent samples the estimate is based on.
+
+    interval : float, optional (default=3600)
+        Seconds after which ``server_now`` takes a new sample. If None, only
+        sample when ``sample`` or ``calibrate`` is called.
+
+    Attributes
+    ----------
+    offset : float
+        The estimated server time - local time, in seconds (None before the
+        first sample).
+
+    error : float
+        Maximum error of the offset, in seconds (None before the first
+        sample).
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, ServerClock
+    >>> k = KrakenAPI(krakenex.API())
+    >>> clock = ServerClock(k)
+    >>> clock.calibrate(4)
+    >>> since = int(clock.server_now()) - 3600
+
+    """
+
+    def __init__(self, k, samples=8, interval=3600):
+
+        self.k = k
+        self.interval = interval
+
+        self.offset = None
+        self.error = None
+
+        self._samples = collections.deque(maxlen=samples)
+        self._sampled = None
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Query the server time once and update the offset estimate.
+
+        Returns
+        -------
+        offset : float
+            The estimated server time - local time, in seconds.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        sent = time.time()
+        _, unixtime = self.k.get_server_time()
+        received = time.time()
+
+        with self._lock:
+            self._samples.append((sent, received, unixtime))
+            self._sampled = received
+            self._estimate()
+
+        return self.offset
+
+    def calibrate(self, n=4):
+        """Take n samples, return the offset estimate.
+
+        See ``sample``.
+
+        """
+
+        for _ in range(n):
+            self.sample()
+
+        return self.offset
+
+    def server_now(self):
+        """Return the estimated current server time (unixtime, float).
+
+        Takes a new sample if there is none, or if the last one is older than
+        ``interval`` seconds.
+
+        """
+
+        if self._sampled is None or (
+                self.interval is not None and
+                time.time() - self._sampled > self.interval):
+            self.sample()
+
+        return time.time() + self.offset
+
+    def server_datetime(self):
+        """Return the estimated current server time (UTC datetime)."""
+
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(
+            0, self.server_now())
+
+    def _estimate(self):
+
+        # offset bounds of each sample
+        lower = max(unixtime - received for sent, received, unixtime in
+                    self._samples)
+        upper = min(unixtime + 1 - sent for sent, received, unixtime in
+                    self._samples)
+
+        # inconsistent samples: use the sample with the lowest round trip time
+        if lower > upper:
+            sent, received, unixtime = min(
+                self._samples, key=lambda sample: sample[1] - sample[0])
+            lower = unixtime - received
+            upper = unixtime + 1 - sent
+
+        self.offset = (lower + upper) / 2
+        self.error = (upper - lower) / 2
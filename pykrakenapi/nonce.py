@@ -0,0 +1,95 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Strictly increasing nonces for private queries.
+
+This module contains the class ``NonceAllocator``, which hands out strictly
+increasing nonces to threads and (optionally) processes sharing an API key.
+
+>>> help(NonceAllocator)
+
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class NonceAllocator(object):
+    """Strictly increasing nonces, shared between threads and processes.
+
+    Each nonce is max(previous nonce + 1, milliseconds since the epoch), i.e.
+    compatible with the nonces of ``krakenex.API``, but never repeated when
+    several nonces are requested within the same millisecond.
+
+    Parameters
+    ----------
+    path : str, optional (default=None)
+        File storing the last nonce handed out. If given, nonces are also
+        strictly increasing across all processes using the same file (which is
+        locked while a nonce is allocated, requires ``fcntl``, i.e. a unix
+        system). If None (default), nonces are only strictly increasing
+        within this process.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi.nonce import NonceAllocator
+    >>> api = krakenex.API()
+    >>> api._nonce = NonceAllocator('kraken.nonce')
+
+    """
+
+    def __init__(self, path=None):
+
+        if path is not None and fcntl is None:
+            raise ValueError('nonces shared between processes (path={}) '
+                             'require fcntl'.format(path))
+
+        self.path = path
+        self.last = 0
+
+        self._lock = threading.Lock()
+
+    def __call__(self):
+
+        with self._lock:
+
+            # within this process
+            if self.path is None:
+                self.last = max(self.last + 1, int(1000*time.time()))
+                return self.last
+
+            # across processes
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                stored = os.read(fd, 32).strip()
+                last = max(self.last, int(stored) if stored else 0)
+                self.last = max(last + 1, int(1000*time.time()))
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, str(self.last).encode())
+            finally:
+                os.close(fd)
+
+            return self.last
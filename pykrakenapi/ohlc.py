@@ -0,0 +1,213 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Locally cached OHLC data.
+
+This module contains the class ``OHLCCache``, which keeps the OHLC data
+returned by ``KrakenAPI.get_ohlc_data`` and only queries bars that were not
+committed yet when polled again.
+
+>>> help(OHLCCache)
+
+"""
+
+import os
+import pickle
+import threading
+
+import pandas as pd
+
+
+class OHLCCache(object):
+    """Locally cached, incrementally extended OHLC data.
+
+    Keeps the OHLC data of each (pair, interval) in memory (and optionally on
+    disc). When polled again, only the bars since the last committed bar are
+    queried (see ``since`` in ``KrakenAPI.get_ohlc_data``); they replace the
+    previously uncommitted last bar.
+
+    Parameters
+    ----------
+    k : KrakenAPI
+        The KrakenAPI instance used to query OHLC data.
+
+    path : str, optional (default=None)
+        Folder to persist the OHLC data in (one "pair_interval.pickle" file
+        per pair and interval), and to load it from when a pair and interval
+        are requested for the first time. If None (default), keep OHLC data
+        in memory only.
+
+    maxlen : int, optional (default=None)
+        Maximum number of bars to keep per pair and interval. If None
+        (default), keep all bars.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, OHLCCache
+    >>> k = KrakenAPI(krakenex.API())
+    >>> cache = OHLCCache(k, path='ohlc/')
+    >>> ohlc, last = cache.get_ohlc_data('XXBTZEUR', interval=1)
+
+    """
+
+    def __init__(self, k, path=None, maxlen=None):
+
+        self.k = k
+        self.path = path
+        self.maxlen = maxlen
+
+        self._data = {}
+        self._lock = threading.Lock()
+        self._locks = {}
+
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+
+    def get_ohlc_data(self, pair, interval=1):
+        """Get ohlc data for a given pair.
+
+        Return the cached OHLC data for a given pair and time interval
+        (minutes), extended by the bars committed (and the bar started) since
+        the last query.
+
+        Parameters
+        ----------
+        pair : str
+            Asset pair to get OHLC data for.
+
+        interval : int, optional (default=1)
+            Time frame interval in minutes. See KrakenAPI.get_ohlc_data.
+
+        Returns
+        -------
+        ohlc : pd.DataFrame
+            See KrakenAPI.get_ohlc_data.
+
+        last : int
+            Unixtime of the last committed bar.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        key = (pair, interval)
+
+        # one query per pair and interval at a time
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+
+            # new or cached data
+            if key not in self._data:
+                self._data[key] = self._load(key)
+            cached = self._data[key]
+
+            if cached is None:
+                ohlc, last = self.k.get_ohlc_data(pair, interval=interval)
+
+            # replace bars since the first queried bar (the previously
+            # uncommitted bar), keep all earlier bars
+            else:
+                ohlc, last = cached
+                new, last = self.k.get_ohlc_data(
+                    pair, interval=interval, since=last)
+                if len(new) > 0:
+                    ohlc = pd.concat(
+                        (new, ohlc[ohlc.time < new.time.min()]), axis=0)
+
+            if self.maxlen is not None:
+                ohlc = ohlc.iloc[:self.maxlen]
+
+            self._data[key] = (ohlc, last)
+            self._store(key)
+
+        return ohlc.copy(), last
+
+    def clear(self, pair=None, interval=None):
+        """Drop cached OHLC data.
+
+        Drop the OHLC data of all pairs and intervals (default), or of the
+        given pair and/or interval only, from memory and disc.
+
+        Parameters
+        ----------
+        pair : str, optional (default=None)
+            Asset pair to drop OHLC data for. If None, all pairs.
+
+        interval : int, optional (default=None)
+            Time frame interval to drop OHLC data for. If None, all intervals.
+
+        """
+
+        with self._lock:
+
+            # cached in memory or on disc
+            keys = set(self._data)
+            if self.path is not None:
+                for f in os.listdir(self.path):
+                    if f.endswith('.pickle'):
+                        p, i = f[:-len('.pickle')].rsplit('_', 1)
+                        keys.add((p, int(i)))
+
+            for key in keys:
+                if ((pair is None or key[0] == pair) and
+                        (interval is None or key[1] == interval)):
+                    self._data.pop(key, None)
+                    fname = self._fname(key)
+                    if fname is not None and os.path.exists(fname):
+                        os.remove(fname)
+
+    def _fname(self, key):
+
+        if self.path is None:
+            return None
+
+        return os.path.join(self.path, '{}_{}.pickle'.format(*key))
+
+    def _load(self, key):
+
+        fname = self._fname(key)
+        if fname is None or not os.path.exists(fname):
+            return None
+
+        with open(fname, 'rb') as f:
+            cached = pickle.load(f)
+
+        return cached
+
+    def _store(self, key):
+
+        fname = self._fname(key)
+        if fname is None:
+            return
+
+        # write to a temporary file, then rename it
+        tmp = fname + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self._data[key], f)
+        os.replace(tmp, fname)
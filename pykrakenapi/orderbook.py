@@ -0,0 +1,560 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Locally maintained order book.
+
+This module contains the class ``OrderBook``, which keeps the order book of a
+pair in price-sorted numpy arrays, and applies successive snapshots returned
+by ``KrakenAPI.get_order_book_arrays`` as diffs.
+
+It also contains vectorized analytics (``fill_prices``, ``slippage``,
+``depth_within`` and ``imbalance``), which take the asks and bids returned by
+``KrakenAPI.get_order_book`` or ``KrakenAPI.get_order_book_arrays``, and
+evaluate many sizes (or distances) at once using cumulative sums and binary
+searches.
+
+>>> help(OrderBook)
+
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def _sign(side):
+
+    if side == 'asks':
+        return 1
+    elif side == 'bids':
+        return -1
+
+    raise ValueError("side must be 'asks' or 'bids', not {}".format(side))
+
+
+def _sorted_levels(levels, side):
+    """Return price, volume arrays of a side, best price first."""
+
+    if isinstance(levels, pd.DataFrame):
+        levels = levels[['price', 'volume']].values
+    if len(levels) == 0:
+        return np.empty(0), np.empty(0)
+    levels = np.asarray(levels, dtype=float).reshape(len(levels), -1)
+
+    price = levels[:, 0]
+    volume = levels[:, 1]
+    order = np.argsort(_sign(side) * price, kind='mergesort')
+
+    return price[order], volume[order]
+
+
+def _fill_prices(price, cumvolume, cumnotional, sizes):
+    """Average fill prices of sizes, walking price-sorted levels."""
+
+    sizes = np.asarray(sizes, dtype=float)
+    n = len(price)
+    if n == 0:
+        return np.full(sizes.shape, np.nan)
+
+    # level at which each size is completely filled
+    i = np.searchsorted(cumvolume, sizes, side='left')
+    filled = i < n
+    j = np.minimum(i, n - 1)
+
+    # notional of all better levels, plus the rest at the last level
+    before_volume = np.where(j > 0, cumvolume[j - 1], 0.)
+    before_notional = np.where(j > 0, cumnotional[j - 1], 0.)
+    notional = before_notional + (sizes - before_volume) * price[j]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fill = notional / sizes
+
+    # the book is too thin for sizes beyond its total volume
+    return np.where(filled, fill, np.nan)
+
+
+def _depth_within(key, cumvolume, sign, bps, reference):
+    """Cumulative volume within bps of a reference price."""
+
+    bps = np.asarray(bps, dtype=float)
+    if len(key) == 0:
+        return np.zeros(bps.shape)
+
+    limit = sign * reference * (1 + sign * bps / 1e4)
+    i = np.searchsorted(key, limit, side='right')
+
+    return np.where(i > 0, cumvolume[np.maximum(i - 1, 0)], 0.)
+
+
+def fill_prices(levels, sizes, side):
+    """Average fill prices of market orders of given sizes.
+
+    Parameters
+    ----------
+    levels : pd.DataFrame or np.ndarray
+        One side of the order book, as returned by ``KrakenAPI.get_order_book``
+        or ``KrakenAPI.get_order_book_arrays`` (columns price, volume[, ...]).
+        Need not be sorted.
+
+    sizes : array_like
+        Order volumes (in base currency).
+
+    side : str
+        The side of the book the orders are filled against: 'asks' for buy
+        orders, 'bids' for sell orders.
+
+    Returns
+    -------
+    fill : np.ndarray
+        The volume weighted average price of each size (nan if the volume of
+        the book is smaller than the size).
+
+    """
+
+    price, volume = _sorted_levels(levels, side)
+
+    return _fill_prices(price, np.cumsum(volume), np.cumsum(price * volume),
+                        sizes)
+
+
+def slippage(levels, sizes, side):
+    """Cost of market orders of given sizes, relative to the best price.
+
+    Parameters
+    ----------
+    levels, sizes, side
+        See ``fill_prices``.
+
+    Returns
+    -------
+    slippage : np.ndarray
+        The difference between the average fill price and the best price, in
+        basis points (positive means worse than the best price; nan if the
+        volume of the book is smaller than the size).
+
+    """
+
+    price, volume = _sorted_levels(levels, side)
+    if len(price) == 0:
+        return np.full(np.shape(sizes), np.nan)
+
+    fill = _fill_prices(price, np.cumsum(volume), np.cumsum(price * volume),
+                        sizes)
+
+    slippage = _sign(side) * (fill - price[0]) / price[0] * 1e4
+
+    # no slippage is 0, not -0 (bids)
+    return slippage + 0.
+
+
+def depth_within(levels, bps, side, reference=None):
+    """Cumulative volume within given distances of a reference price.
+
+    Parameters
+    ----------
+    levels, side
+        See ``fill_prices``.
+
+    bps : array_like
+        Distances from the reference price in basis points, i.e. include asks
+        up to reference * (1 + bps/1e4), or bids down to
+        reference * (1 - bps/1e4).
+
+    reference : float, optional (default=None)
+        Reference price. If None, the best price of the side.
+
+    Returns
+    -------
+    depth : np.ndarray
+        The cumulative volume of each distance.
+
+    """
+
+    price, volume = _sorted_levels(levels, side)
+    if reference is None:
+        reference = price[0] if len(price) > 0 else np.nan
+
+    sign = _sign(side)
+
+    return _depth_within(sign * price, np.cumsum(volume), sign, bps,
+                         reference)
+
+
+def imbalance(asks, bids, bps=None):
+    """Order book imbalance.
+
+    Parameters
+    ----------
+    asks, bids : pd.DataFrame or np.ndarray
+        The order book, see ``fill_prices``.
+
+    bps : array_like, optional (default=None)
+        Only include volume within these distances (in basis points) of the
+        mid price, see ``depth_within``. If None, include the whole book.
+
+    Returns
+    -------
+    imbalance : float or np.ndarray
+        (bid volume - ask volume) / (bid volume + ask volume), between -1 (only
+        asks) and 1 (only bids); one value per distance if bps is given.
+
+    """
+
+    ask_price, ask_volume = _sorted_levels(asks, 'asks')
+    bid_price, bid_volume = _sorted_levels(bids, 'bids')
+
+    if bps is None:
+        ask_depth = ask_volume.sum()
+        bid_depth = bid_volume.sum()
+    else:
+        mid = (ask_price[:1].sum() + bid_price[:1].sum()) / 2
+        ask_depth = _depth_within(ask_price, np.cumsum(ask_volume), 1, bps,
+                                  mid)
+        bid_depth = _depth_within(-bid_price, np.cumsum(bid_volume), -1, bps,
+                                  mid)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (bid_depth - ask_depth) / (bid_depth + ask_depth)
+
+
+class _BookSide(object):
+    """One side (asks or bids) of an order book.
+
+    Price levels are kept best price first in preallocated arrays: in
+    ascending order of price for asks (sign=1), in descending order of price
+    for bids (sign=-1). ``_key`` holds sign * price, which is ascending on
+    both sides and used for binary searches.
+
+    """
+
+    def __init__(self, sign, size):
+
+        self.sign = sign
+        self.n = 0
+
+        self._key = np.empty(size)
+        self._price = np.empty(size)
+        self._volume = np.empty(size)
+        self._cumvolume = np.empty(size)
+        self._cumnotional = np.empty(size)
+
+    @property
+    def price(self):
+        return self._price[:self.n]
+
+    @property
+    def volume(self):
+        return self._volume[:self.n]
+
+    @property
+    def cumvolume(self):
+        return self._cumvolume[:self.n]
+
+    def apply(self, levels):
+        """Replace the levels by a snapshot, return the changed levels."""
+
+        price = levels[:, 0]
+        volume = levels[:, 1]
+        key = self.sign * price
+
+        # old levels within the price range of the snapshot (levels beyond the
+        # worst price of the snapshot are unknown, not removed)
+        old_key = self._key[:self.n]
+        old_volume = self._volume[:self.n]
+        if len(key) > 0:
+            m = np.searchsorted(old_key, key[-1], side='right')
+        else:
+            m = 0
+        old_key = old_key[:m]
+        old_volume = old_volume[:m]
+
+        # changed levels: volume differs, new volume 0 for removed levels
+        levels_key = np.union1d(old_key, key)
+        before = np.zeros(len(levels_key))
+        before[np.searchsorted(levels_key, old_key)] = old_volume
+        after = np.zeros(len(levels_key))
+        after[np.searchsorted(levels_key, key)] = volume
+        changed = before != after
+        changes = np.column_stack((self.sign * levels_key[changed],
+                                   after[changed]))
+
+        # store snapshot, grow buffers if needed
+        n = len(key)
+        if n > len(self._key):
+            self._key = np.empty(n)
+            self._price = np.empty(n)
+            self._volume = np.empty(n)
+            self._cumvolume = np.empty(n)
+            self._cumnotional = np.empty(n)
+        self._key[:n] = key
+        self._price[:n] = price
+        self._volume[:n] = volume
+        np.cumsum(volume, out=self._cumvolume[:n])
+        np.cumsum(price * volume, out=self._cumnotional[:n])
+        self.n = n
+
+        return changes
+
+    def best(self):
+
+        if self.n == 0:
+            return np.nan, np.nan
+
+        return self._price[0], self._volume[0]
+
+    def volume_at(self, price):
+
+        key = self.sign * price
+        i = np.searchsorted(self._key[:self.n], key)
+        if i < self.n and self._key[i] == key:
+            return self._volume[i]
+
+        return 0.
+
+    def depth(self, price):
+
+        key = self.sign * price
+        i = np.searchsorted(self._key[:self.n], key, side='right')
+        if i == 0:
+            return 0.
+
+        return self._cumvolume[i - 1]
+
+    def fill_prices(self, sizes):
+
+        return _fill_prices(self._price[:self.n], self._cumvolume[:self.n],
+                            self._cumnotional[:self.n], sizes)
+
+    def depth_within(self, bps, reference):
+
+        return _depth_within(self._key[:self.n], self._cumvolume[:self.n],
+                             self.sign, bps, reference)
+
+
+class OrderBook(object):
+    """Order book of a pair, kept in price-sorted numpy arrays.
+
+    Each call of ``update`` queries a snapshot of the order book (see
+    ``KrakenAPI.get_order_book_arrays``), and applies it to the local book as
+    a diff: the levels whose volume changed since the previous snapshot are
+    available in ``changes``. The best bid/ask is available in O(1), the
+    volume at and the cumulative depth up to a given price in O(log n). Fill
+    prices, depth within distances and the imbalance are computed on the
+    cumulative volumes and notionals kept with each snapshot.
+
+    Parameters
+    ----------
+    k : KrakenAPI
+        The KrakenAPI instance used to query the order book.
+
+    pair : str
+        Asset pair of the order book.
+
+    count : int, optional (default=100)
+        Number of asks/bids queried per snapshot. Levels beyond the worst
+        price of a snapshot are not part of the local book.
+
+    Attributes
+    ----------
+    changes : dict
+        The levels changed by the last snapshot, as ``np.ndarray``'s with
+        columns price, volume (the new volume, 0 if the level was removed),
+        for both 'asks' and 'bids'.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, OrderBook
+    >>> k = KrakenAPI(krakenex.API())
+    >>> book = OrderBook(k, 'XXBTZEUR', count=500)
+    >>> changes = book.update()
+    >>> bid, ask = book.best_bid(), book.best_ask()
+    >>> depth = book.depth('bids', bid[0] * .99)
+
+    """
+
+    def __init__(self, k, pair, count=100):
+
+        self.k = k
+        self.pair = pair
+        self.count = count
+
+        self.asks = _BookSide(1, count)
+        self.bids = _BookSide(-1, count)
+        self.changes = {'asks': np.empty((0, 2)), 'bids': np.empty((0, 2))}
+
+        self._lock = threading.Lock()
+
+    def update(self):
+        """Query a snapshot of the order book and apply it.
+
+        Returns
+        -------
+        changes : dict
+            The changed levels, see ``changes``.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        asks, bids = self.k.get_order_book_arrays(self.pair, count=self.count)
+
+        return self.apply_snapshot(asks, bids)
+
+    def apply_snapshot(self, asks, bids):
+        """Apply a snapshot of the order book.
+
+        Parameters
+        ----------
+        asks, bids : np.ndarray
+            The ask and bid side tables, best price first, with columns
+            price, volume[, ...], as returned by
+            ``KrakenAPI.get_order_book_arrays``.
+
+        Returns
+        -------
+        changes : dict
+            The changed levels, see ``changes``.
+
+        """
+
+        with self._lock:
+            self.changes = {'asks': self.asks.apply(asks),
+                            'bids': self.bids.apply(bids)}
+
+        return self.changes
+
+    def best_ask(self):
+        """Return price and volume of the best ask (nan if empty)."""
+
+        return self.asks.best()
+
+    def best_bid(self):
+        """Return price and volume of the best bid (nan if empty)."""
+
+        return self.bids.best()
+
+    def spread(self):
+        """Return the difference between the best ask and best bid price."""
+
+        return self.asks.best()[0] - self.bids.best()[0]
+
+    def mid(self):
+        """Return the mean of the best ask and best bid price."""
+
+        return (self.asks.best()[0] + self.bids.best()[0]) / 2
+
+    def volume_at(self, side, price):
+        """Return the volume at a given price level (0 if not in the book).
+
+        Parameters
+        ----------
+        side : str
+            'asks' or 'bids'.
+
+        price : float
+            Price of the level.
+
+        """
+
+        return self._side(side).volume_at(price)
+
+    def depth(self, side, price):
+        """Return the cumulative volume from the best price up to a price.
+
+        Parameters
+        ----------
+        side : str
+            'asks' or 'bids'.
+
+        price : float
+            Worst price to include (the highest ask, or the lowest bid).
+
+        """
+
+        return self._side(side).depth(price)
+
+    def fill_prices(self, side, sizes):
+        """Return the average fill prices of given sizes.
+
+        See ``pykrakenapi.orderbook.fill_prices``.
+
+        """
+
+        return self._side(side).fill_prices(sizes)
+
+    def depth_within(self, side, bps, reference=None):
+        """Return the cumulative volume within distances of a price.
+
+        See ``pykrakenapi.orderbook.depth_within``.
+
+        """
+
+        side = self._side(side)
+        if reference is None:
+            reference = side.best()[0]
+
+        return side.depth_within(bps, reference)
+
+    def imbalance(self, bps=None):
+        """Return the order book imbalance.
+
+        See ``pykrakenapi.orderbook.imbalance``.
+
+        """
+
+        if bps is None:
+            ask_depth = self.asks.cumvolume[-1:].sum()
+            bid_depth = self.bids.cumvolume[-1:].sum()
+        else:
+            mid = self.mid()
+            ask_depth = self.asks.depth_within(bps, mid)
+            bid_depth = self.bids.depth_within(bps, mid)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (bid_depth - ask_depth) / (bid_depth + ask_depth)
+
+    def levels(self, side):
+        """Return price and volume arrays of one side, best price first.
+
+        The arrays are views on the book; they must not be modified and are
+        overwritten by the next snapshot.
+
+        Parameters
+        ----------
+        side : str
+            'asks' or 'bids'.
+
+        """
+
+        side = self._side(side)
+
+        return side.price, side.volume
+
+    def _side(self, side):
+
+        return self.asks if _sign(side) == 1 else self.bids
@@ -0,0 +1,227 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Locally tracked order states.
+
+This module contains the class ``OrderTracker``, which keeps a local table of
+the states of orders, and only queries the orders closed since its last
+query.
+
+>>> help(OrderTracker)
+
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+
+class OrderTracker(object):
+    """Local table of order states, updated by delta queries.
+
+    Each call of ``poll`` queries the open orders (see
+    ``KrakenAPI.get_open_orders``) and only the orders closed since the latest
+    close time seen so far (see ``start`` and ``ofs`` of
+    ``KrakenAPI.get_closed_orders``), so that its cost depends on the number
+    of open and recently closed orders, not on the size of the account
+    history. Changes of order states are emitted as events:
+
+    new
+        An open order was seen for the first time.
+
+    partially_filled
+        The executed volume of an open order increased.
+
+    filled
+        An order was closed with its whole volume executed.
+
+    canceled
+        An order was canceled (possibly partially filled, see vol_exec).
+
+    expired
+        An order expired (possibly partially filled, see vol_exec).
+
+    Parameters
+    ----------
+    k : KrakenAPI
+        The KrakenAPI instance used to query orders.
+
+    start : float, optional (default=None)
+        Track orders closed after this unixtime. If None (default), track
+        orders closed after the tracker was created.
+
+    userref : int, optional (default=None)
+        Only track orders with this user reference id.
+
+    callback : callable, optional (default=None)
+        Called with each event (a dict, see ``poll``).
+
+    overlap : float, optional (default=1)
+        Seconds by which successive queries of closed orders overlap, to not
+        miss orders closed in the same second (close times are truncated to
+        seconds). Orders seen twice emit no events.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, OrderTracker
+    >>> api = krakenex.API()
+    >>> api.load_key('kraken.key')
+    >>> k = KrakenAPI(api)
+    >>> tracker = OrderTracker(k)
+    >>> while True:
+    ...     for event in tracker.poll():
+    ...         print(event['event'], event['txid'], event['vol_exec'])
+
+    """
+
+    def __init__(self, k, start=None, userref=None, callback=None, overlap=1):
+
+        self.k = k
+        self.userref = userref
+        self.callback = callback
+        self.overlap = overlap
+
+        self.last_closetm = time.time() if start is None else start
+
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Query changed orders, update the order table and emit events.
+
+        Returns
+        -------
+        events : list of dict
+            The events, with keys event, txid, time (local unixtime of the
+            poll), status, pair, type, vol, vol_exec.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        with self._lock:
+            now = time.time()
+            events = []
+
+            # new states are only applied (and events only emitted) once all
+            # queries succeeded, so that the orders of a failed poll are
+            # compared to their previous states again by the next poll
+            states = {}
+
+            # open orders
+            openorders = self.k.get_open_orders(userref=self.userref)
+            for txid, order in openorders.get('open', {}).items():
+                events.extend(self._update(txid, order, now, states))
+
+            # orders closed since the last query, most recent first
+            start = int(self.last_closetm - self.overlap)
+            last_closetm = self.last_closetm
+            ofs = 0
+            while True:
+                closed, count = self.k.get_closed_orders(
+                    userref=self.userref, start=start, ofs=ofs,
+                    closetime='close')
+                if len(closed) == 0:
+                    break
+                for txid, order in closed.iterrows():
+                    order = order.to_dict()
+                    order['descr'] = {
+                        'pair': order.get('descr_pair'),
+                        'type': order.get('descr_type')}
+                    events.extend(self._update(txid, order, now, states))
+                    last_closetm = max(last_closetm, float(order['closetm']))
+                ofs += len(closed)
+                if ofs >= int(count):
+                    break
+
+            self._orders.update(states)
+            self.last_closetm = last_closetm
+
+        if self.callback is not None:
+            for event in events:
+                self.callback(event)
+
+        return events
+
+    def table(self):
+        """Return the order table.
+
+        Returns
+        -------
+        orders : pd.DataFrame
+            index = txid
+            status, pair, type, vol, vol_exec, closetm (of the tracked
+            orders)
+
+        """
+
+        with self._lock:
+            orders = pd.DataFrame.from_dict(
+                self._orders, orient='index',
+                columns=['status', 'pair', 'type', 'vol', 'vol_exec',
+                         'closetm'])
+        orders.index.name = 'txid'
+
+        return orders
+
+    def _update(self, txid, order, now, states):
+
+        # state of order into states, event if it changed (compared to
+        # states, or to the order table)
+
+        status = order.get('status')
+        descr = order.get('descr') or {}
+        state = {'status': status, 'pair': descr.get('pair'),
+                 'type': descr.get('type'), 'vol': float(order['vol']),
+                 'vol_exec': float(order['vol_exec']),
+                 'closetm': order.get('closetm')}
+
+        known = states.get(txid, self._orders.get(txid))
+        states[txid] = state
+
+        # determine event
+        if status in ('open', 'pending'):
+            if known is None:
+                event = 'new'
+            elif state['vol_exec'] > known['vol_exec']:
+                event = 'partially_filled'
+            else:
+                return []
+        elif known is not None and known['status'] == status:
+            return []
+        elif status == 'closed':
+            event = 'filled'
+        elif status in ('canceled', 'expired'):
+            event = status
+        else:
+            return []
+
+        event = dict(state, event=event, txid=txid, time=now)
+        del event['closetm']
+
+        return [event]
@@ -0,0 +1,395 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Fixed memory pollers of spread and ticker data.
+
+This module contains the classes ``SpreadPoller`` and ``TickerPoller``, which
+repeatedly query ``KrakenAPI.get_recent_spread_data`` and
+``KrakenAPI.get_ticker_information``, and keep the most recent entries of
+each pair in preallocated ring buffers.
+
+>>> help(SpreadPoller)
+>>> help(TickerPoller)
+
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class _RingBuffer(object):
+    """Fixed size buffer of the most recent rows.
+
+    Every row is written twice, at i and i + capacity, so that the last n
+    rows (n <= capacity) are always contiguous and available as a view.
+
+    """
+
+    def __init__(self, capacity, ncols):
+
+        self.capacity = capacity
+        self.count = 0
+        self.size = 0
+
+        self._data = np.full((2 * capacity, ncols), np.nan)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, rows):
+
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        if n == 0:
+            return
+
+        # positions of the rows, wrapping around
+        pos = (self.count + np.arange(n)) % self.capacity
+        self._data[pos] = rows
+        self._data[pos + self.capacity] = rows
+        self.count += n
+        self.size = min(self.size + n, self.capacity)
+
+    def truncate(self, n):
+        """Drop the last n rows."""
+
+        n = min(n, self.size)
+        self.count -= n
+        self.size -= n
+
+    def view(self, n=None):
+        """Return the last n rows (default all) as a view."""
+
+        size = len(self)
+        n = size if n is None else min(n, size)
+        end = self.count % self.capacity + self.capacity
+
+        return self._data[end - n:end]
+
+
+class _Poller(object):
+
+    columns = []
+
+    def __init__(self, k, pairs, capacity):
+
+        if isinstance(pairs, str):
+            pairs = pairs.split(',')
+
+        self.k = k
+        self.pairs = list(pairs)
+        self.capacity = capacity
+
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def window(self, pair, n=None):
+        """Return the most recent entries of a pair.
+
+        Parameters
+        ----------
+        pair : str
+            Asset pair.
+
+        n : int, optional (default=None)
+            Number of entries. If None, all buffered entries.
+
+        Returns
+        -------
+        window : np.ndarray
+            The entries in ascending order of time, with ``columns``. The
+            array is a view on the ring buffer; it must not be modified and is
+            overwritten by later polls.
+
+        """
+
+        return self._buffer(pair).view(n)
+
+    def frame(self, pair, n=None):
+        """Return the most recent entries of a pair as a ``pd.DataFrame``.
+
+        Like ``window``, the DataFrame shares memory with the ring buffer.
+
+        """
+
+        window = self.window(pair, n)
+        dtime = pd.to_datetime(window[:, 0], unit='s').rename('dtime')
+        frame = pd.DataFrame(window, index=dtime, columns=self.columns,
+                             copy=False)
+
+        return frame
+
+    def stats(self, pair, n=None):
+        """Return statistics of the most recent entries of a pair.
+
+        Parameters
+        ----------
+        pair : str
+            Asset pair.
+
+        n : int, optional (default=None)
+            Number of entries. If None, all buffered entries.
+
+        Returns
+        -------
+        stats : pd.DataFrame
+            index = mean, std, min, max, last
+            columns = ``columns`` (except time)
+            (nan if no entries are buffered)
+
+        """
+
+        window = self.window(pair, n)[:, 1:]
+
+        # nothing buffered yet
+        if len(window) == 0:
+            return pd.DataFrame(
+                np.nan, index=['mean', 'std', 'min', 'max', 'last'],
+                columns=self.columns[1:])
+
+        stats = pd.DataFrame(
+            [window.mean(axis=0), window.std(axis=0), window.min(axis=0),
+             window.max(axis=0), window[-1]],
+            index=['mean', 'std', 'min', 'max', 'last'],
+            columns=self.columns[1:])
+
+        return stats
+
+    def rolling_mean(self, pair, column, length, n=None):
+        """Return the rolling mean of a column of a pair.
+
+        Parameters
+        ----------
+        pair : str
+            Asset pair.
+
+        column : str
+            One of ``columns``.
+
+        length : int
+            Number of entries per mean.
+
+        n : int, optional (default=None)
+            Number of most recent entries to compute rolling means over. If
+            None, all buffered entries.
+
+        Returns
+        -------
+        mean : np.ndarray
+            The means of the n - length + 1 complete windows, in ascending
+            order of time.
+
+        """
+
+        values = self.window(pair, n)[:, self.columns.index(column)]
+        cumsum = np.cumsum(np.concatenate(([0.], values)))
+
+        return (cumsum[length:] - cumsum[:-length]) / length
+
+    def _buffer(self, pair):
+
+        try:
+            return self._buffers[pair]
+        except KeyError:
+            return self._buffers[self.k.resolve_pair(pair)]
+
+    def _get_buffer(self, pair):
+
+        if pair not in self._buffers:
+            self._buffers[pair] = _RingBuffer(
+                self.capacity, len(self.columns))
+
+        return self._buffers[pair]
+
+
+class SpreadPoller(_Poller):
+    """Recent spread data of pairs, kept in fixed size ring buffers.
+
+    Each call of ``poll`` queries ``KrakenAPI.get_recent_spread_data`` for each
+    pair, since the ``last`` timestamp of the previous query, and writes the
+    new entries into a preallocated ring buffer per pair. Entries returned
+    again (``since`` is inclusive) overwrite the buffered entries at the same
+    time. Memory use is constant, no matter how long the poller runs.
+
+    Parameters
+    ----------
+    k : KrakenAPI
+        The KrakenAPI instance used to query spread data.
+
+    pairs : iterable of str
+        Asset pairs to poll (or a comma delimited list of asset pairs).
+
+    capacity : int, optional (default=100000)
+        Number of most recent entries kept per pair.
+
+    Attributes
+    ----------
+    columns : list
+        time (unixtime), bid, ask, spread
+
+    last : dict
+        The ``last`` timestamp of each pair, used as ``since`` by the next
+        poll.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, SpreadPoller
+    >>> k = KrakenAPI(krakenex.API())
+    >>> poller = SpreadPoller(k, ['XXBTZEUR', 'XETHZEUR'])
+    >>> while True:
+    ...     poller.poll()
+    ...     spread = poller.stats('XXBTZEUR', n=1000).loc['mean', 'spread']
+
+    """
+
+    columns = ['time', 'bid', 'ask', 'spread']
+
+    def __init__(self, k, pairs, capacity=100000):
+
+        super(SpreadPoller, self).__init__(k, pairs, capacity)
+
+        self.last = {}
+
+    def poll(self):
+        """Query new spread data of all pairs.
+
+        Returns
+        -------
+        new : dict
+            The number of new (or overwritten) entries of each pair.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        new = {}
+        for pair in self.pairs:
+            spread, last = self.k.get_recent_spread_data(
+                pair, since=self.last.get(pair))
+            rows = spread[self.columns].values[::-1].astype(float)
+
+            with self._lock:
+                buffer = self._get_buffer(pair)
+
+                # since is inclusive, overwrite entries at the same time
+                if len(rows) > 0:
+                    buffered = buffer.view()[:, 0]
+                    buffer.truncate(
+                        len(buffered) -
+                        np.searchsorted(buffered, rows[0, 0], side='left'))
+                buffer.append(rows)
+
+                self.last[pair] = last
+
+            new[pair] = len(rows)
+
+        return new
+
+
+class TickerPoller(_Poller):
+    """Ticker information of pairs, kept in fixed size ring buffers.
+
+    Each call of ``poll`` queries ``KrakenAPI.get_ticker_information`` once
+    for all pairs, and writes one entry per pair into a preallocated ring
+    buffer per pair. Memory use is constant, no matter how long the poller
+    runs.
+
+    Parameters
+    ----------
+    k : KrakenAPI
+        The KrakenAPI instance used to query ticker information.
+
+    pairs : iterable of str
+        Asset pairs to poll (or a comma delimited list of asset pairs).
+
+    capacity : int, optional (default=100000)
+        Number of most recent entries kept per pair.
+
+    Attributes
+    ----------
+    columns : list
+        time (local unixtime of the poll), ask, bid, last (trade price),
+        volume, vwap, trades, low, high (all of the last 24 hours), open
+        (today's opening price)
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, TickerPoller
+    >>> k = KrakenAPI(krakenex.API())
+    >>> poller = TickerPoller(k, ['XXBTZEUR', 'XETHZEUR'])
+    >>> while True:
+    ...     poller.poll()
+    ...     mean = poller.rolling_mean('XXBTZEUR', 'last', 60, n=600)
+
+    """
+
+    columns = ['time', 'ask', 'bid', 'last', 'volume', 'vwap', 'trades',
+               'low', 'high', 'open']
+
+    def __init__(self, k, pairs, capacity=100000):
+
+        super(TickerPoller, self).__init__(k, pairs, capacity)
+
+    def poll(self):
+        """Query ticker information of all pairs.
+
+        Returns
+        -------
+        new : dict
+            The number of new entries of each pair (as named in the result).
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        ticker = self.k.get_ticker_information(','.join(self.pairs))
+        now = time.time()
+
+        new = {}
+        with self._lock:
+            for pair, info in ticker.iterrows():
+                row = np.array([[
+                    now, info.a[0], info.b[0], info.c[0], info.v[1],
+                    info.p[1], info.t[1], info.l[1], info.h[1], info.o]],
+                    dtype=float)
+                self._get_buffer(pair).append(row)
+                new[pair] = 1
+
+        return new
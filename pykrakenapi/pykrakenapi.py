@@ -26,14 +26,45 @@ For further information type
 
 """
 
+import os
 import time
+import pickle
+import inspect
 import datetime
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN
 from functools import wraps
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from requests import HTTPError
 
+from pykrakenapi.nonce import NonceAllocator
+
+
+# priorities of calls sharing the call rate limit, highest first
+PRIORITIES = ['critical', 'normal', 'bulk']
+
+# minimum number of seconds between rebuilds of a name lookup table for
+# unknown names
+_INDEX_REBUILD_INTERVAL = 60
+
+# per pair order rate limits of each tier (Kraken's trading rate limits):
+# counter threshold and decrease per second
+_ORDER_RATE_LIMITS = {2: (60, 1.), 3: (125, 2.34), 4: (180, 3.75)}
+
+# retries of orders rejected by the per pair order rate limit, after 1, 2, 4,
+# ... seconds
+_ORDER_RATE_RETRIES = 5
+
+# order rate counter penalty of canceling an order younger than the given
+# number of seconds
+_CANCEL_PENALTIES = ((5, 8), (10, 6), (15, 5), (45, 4), (90, 2), (300, 1))
+
 
 def crl_sleep(func):
     @wraps(func)
@@ -47,15 +78,25 @@ def crl_sleep(func):
             result = func(*args, **kwargs)
             return result
 
-        # otherwise, retry after "crl_sleep" seconds
-        while True:
-            try:
-                result = func(*args, **kwargs)
-                return result
-            except CallRateLimitError as err:
-                print(err, '\n sleeping for {} seconds'.format(crl_sleep))
-                time.sleep(crl_sleep)
-                continue
+        # otherwise, retry as soon as the counter decreases (after at most
+        # "crl_sleep" seconds); while waiting, calls of lower priority are not
+        # admitted (see ``priority``)
+        waiting = None
+        try:
+            while True:
+                try:
+                    result = func(*args, **kwargs)
+                    return result
+                except CallRateLimitError as err:
+                    if waiting is None:
+                        waiting = self._enqueue()
+                        print(err, '\n sleeping for at most {} seconds'.format(
+                            crl_sleep))
+                    self._wait_for_counter(crl_sleep)
+                    continue
+        finally:
+            if waiting is not None:
+                self._dequeue(waiting)
 
     return wrapper
 
@@ -81,22 +122,17 @@ def callratelimiter(query_type):
             elif query_type == 'other':
                 incr = 1
 
-            # decrease api counter
-            self._decrease_api_counter()
-
             # return api call
-            if self.api_counter < self.limit:
+            if self._increase_api_counter(incr):
                 # no retries
                 if self.retry == 0:
-                    self.api_counter += incr
                     result = func(*args, **kwargs)
                     return result
                 # do retries
                 else:
                     attempt = 0
-                    while self.api_counter < self.limit:
+                    while True:
                         try:
-                            self.api_counter += incr
                             result = func(*args, **kwargs)
                             return result
                         except (HTTPError, KrakenAPIError) as err:
@@ -104,19 +140,326 @@ def callratelimiter(query_type):
                                 str(attempt).zfill(3)), err)
                             attempt += 1
                             time.sleep(self.retry)
-                            self._decrease_api_counter()
-                            continue
+                            if not self._increase_api_counter(incr):
+                                break
 
             # raise error if limit exceeded
-            msg = ("call rate limiter exceeded (counter={}, limit={})")
+            msg = ("call rate limiter exceeded (counter={}, limit={}, "
+                   "priority={})")
             msg = msg.format(str(self.api_counter).zfill(2),
-                             str(self.limit).zfill(2))
+                             str(self.limit).zfill(2),
+                             self._current_priority())
             raise CallRateLimitError(msg)
 
         return wrapper
     return decorate_func
 
 
+def metadatacache(func):
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """Metadata cache.
+
+        Cache the results of queries for data that rarely changes (asset info,
+        tradable asset pairs) for ``cache_ttl`` seconds. Cached results do not
+        count towards the call rate limit.
+
+        """
+
+        self = args[0]
+
+        # no caching
+        if self.cache_ttl == 0:
+            result = func(*args, **kwargs)
+            return result
+
+        # cache key, independent of how arguments were passed
+        key = _call_key(func, signature, args, kwargs)
+
+        # return a copy of a cached result, refresh expired results in the
+        # background or query them again
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry is not None:
+            cached_at, result = entry
+            if time.time() - cached_at < self.cache_ttl:
+                return result.copy()
+            if self.cache_refresh:
+                self._refresh_cache(key, func, args, kwargs)
+                return result.copy()
+
+        result = func(*args, **kwargs)
+        self._store_cache(key, result)
+
+        return result.copy()
+
+    return wrapper
+
+
+def singleflight(func):
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """Query coalescing.
+
+        Identical queries issued while one of them is in flight (or, if
+        ``coalesce_ttl`` is set, less than ``coalesce_ttl`` seconds after it
+        returned) share one call to the Kraken API and its result. Only that
+        one call counts towards the call rate limit.
+
+        """
+
+        self = args[0]
+
+        # no coalescing
+        if not self.coalesce:
+            result = func(*args, **kwargs)
+            return result
+
+        key = _call_key(func, signature, args, kwargs)
+
+        # join a query in flight (or recently returned), or start a new one
+        with self._flights_lock:
+            now = time.time()
+            flight = self._flights.get(key)
+            if flight is not None and not flight.expired(now):
+                leader = False
+            else:
+                for other_key, other in list(self._flights.items()):
+                    if other.expired(now):
+                        del self._flights[other_key]
+                flight = _Flight(self.coalesce_ttl)
+                self._flights[key] = flight
+                leader = True
+
+        if leader:
+            try:
+                flight.result = func(*args, **kwargs)
+            except Exception as err:
+                flight.error = err
+            finally:
+                flight.finish()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+
+        # every caller gets its own copy of the result
+        return _copy_result(flight.result)
+
+    return wrapper
+
+
+def timed(key_arg):
+    def decorate_func(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            """Latency timeline.
+
+            Record the timestamps of the phases of the call in ``timeline``
+            (if set), keyed by the value of the argument ``key_arg``.
+
+            """
+
+            self = args[0]
+
+            # no timeline
+            if self.timeline is None:
+                result = func(*args, **kwargs)
+                return result
+
+            key = signature.bind(*args, **kwargs).arguments.get(key_arg)
+            self.timeline.begin(func.__name__, key)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as err:
+                self.timeline.end(error=str(err))
+                raise
+            self.timeline.end()
+
+            return result
+
+        return wrapper
+    return decorate_func
+
+
+def profiled(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """Phase profiling.
+
+        Record the timestamps of the phases of the call in ``profile`` (if
+        set).
+
+        """
+
+        self = args[0]
+
+        # no profile
+        if self.profile is None:
+            result = func(*args, **kwargs)
+            return result
+
+        self.profile.begin(func.__name__)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as err:
+            self.profile.end(error=str(err))
+            raise
+        self.profile.end()
+
+        return result
+
+    return wrapper
+
+
+class _Flight(object):
+
+    def __init__(self, ttl):
+
+        self.ttl = ttl
+        self.done = threading.Event()
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    def finish(self):
+
+        self.finished = time.time()
+        self.done.set()
+
+    def expired(self, now):
+
+        # in flight
+        if not self.done.is_set():
+            return False
+
+        # failed queries are not shared after they returned
+        if self.error is not None:
+            return True
+
+        return now - self.finished >= self.ttl
+
+
+def _call_key(func, signature, args, kwargs):
+
+    # hashable key of a method call, independent of how arguments were passed
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    key = (func.__name__,) + tuple(
+        (arg, value) for arg, value in bound.arguments.items()
+        if arg != 'self')
+
+    return key
+
+
+def _copy_result(result):
+
+    if isinstance(result, tuple):
+        return tuple(_copy_result(res) for res in result)
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray)):
+        return result.copy()
+
+    return result
+
+
+def _local_response_query(api):
+
+    # ``_query`` of krakenex.API stores each response in ``api.response``
+    # and decodes it from there, so concurrent queries (see
+    # ``KrakenAPI.parallel``) decode each other's responses; this
+    # replacement keeps the response of each query local (``api.response``
+    # is still set, to the most recent response)
+    def _query(urlpath, data, headers=None, timeout=None):
+
+        if data is None:
+            data = {}
+        if headers is None:
+            headers = {}
+
+        # public endpoints only support GET
+        url = api.uri + urlpath
+        if '/public/' in urlpath:
+            response = api.session.get(
+                url, params=data, headers=headers, timeout=timeout)
+        else:
+            response = api.session.post(
+                url, data=data, headers=headers, timeout=timeout)
+        api.response = response
+
+        if response.status_code not in (200, 201, 202):
+            response.raise_for_status()
+
+        return response.json(**getattr(api, '_json_options', {}))
+
+    return _query
+
+
+# order types and the number of prices they require
+_ORDERTYPES = {
+    'market': 0, 'settle-position': 0, 'limit': 1, 'stop-loss': 1,
+    'take-profit': 1, 'trailing-stop': 1, 'stop-loss-limit': 2,
+    'take-profit-limit': 2, 'trailing-stop-limit': 2,
+    'stop-loss-profit': 2, 'stop-loss-profit-limit': 2,
+    'stop-loss-and-limit': 2}
+
+
+def _is_absolute(price):
+
+    # relative prices are prefixed by +, - or #, or suffixed by %
+    price = str(price)
+    return not (price[:1] in '+-#' or price.endswith('%'))
+
+
+def _round_price(price, spec):
+
+    # round to the tick size (if given) or to the pair's decimals (in
+    # decimal arithmetic, so that prices on the grid are kept as they are)
+    decimals = Decimal(1).scaleb(-int(spec['pair_decimals']))
+    price = Decimal(str(price))
+    tick_size = Decimal(str(spec.get('tick_size', 0)))
+    if tick_size > 0:
+        price = (price / tick_size).quantize(
+            Decimal(1), rounding=ROUND_HALF_EVEN) * tick_size
+    price = price.quantize(decimals, rounding=ROUND_HALF_EVEN)
+
+    return '{:f}'.format(price)
+
+
+def _chunk_names(names, max_length):
+
+    # pack (unique) names into comma delimited lists whose URL encoded length
+    # does not exceed ``max_length``
+    if isinstance(names, str):
+        names = names.split(',')
+    names = list(dict.fromkeys(names))
+
+    chunks = []
+    chunk = []
+    length = 0
+    for name in names:
+        incr = len(quote(name, safe=''))
+        if len(chunk) > 0:
+            incr += len(quote(',', safe=''))
+        if len(chunk) > 0 and length + incr > max_length:
+            chunks.append(','.join(chunk))
+            chunk = []
+            length = 0
+            incr = len(quote(name, safe=''))
+        chunk.append(name)
+        length += incr
+    if len(chunk) > 0:
+        chunks.append(','.join(chunk))
+
+    return chunks
+
+
 class KrakenAPIError(Exception):
     pass
 
@@ -125,6 +468,10 @@ class CallRateLimitError(Exception):
     pass
 
 
+class OrderValidationError(Exception):
+    pass
+
+
 class KrakenAPI(object):
     """A python implementation of the Kraken API.
 
@@ -138,7 +485,8 @@ class KrakenAPI(object):
     ----------
     api : krakenex.API
         An instance of the krakenex.API class. A reference to the input
-        is created and accessible via ``KrakenAPI.api``.
+        is created and accessible via ``KrakenAPI.api``. Its nonces are
+        allocated by ``KrakenAPI.nonce`` (see ``nonce_path``).
 
     tier : int, optional (default=3)
         Your Kraken tier level, used to adjust the limit of the call rate to
@@ -153,24 +501,137 @@ class KrakenAPI(object):
         HTTPError/KrakenAPIError instead of retrying the query.
 
     crl_sleep : int, optional (default=5)
-        Sleep for ``crl_sleep`` seconds after a CallRateLimitError occurred,
-        then retry the query. If ``crl_sleep`` is set to 0, raise a potential
-        CallRateLimitError instead of sleeping and retrying.
+        Sleep for at most ``crl_sleep`` seconds after a CallRateLimitError
+        occurred, then retry the query. The query is retried as soon as the
+        call rate counter decreases (see Notes). If ``crl_sleep`` is set to 0,
+        raise a potential CallRateLimitError instead of sleeping and retrying.
+
+    cache_ttl : float, optional (default=0)
+        Cache the results of ``get_asset_info`` and
+        ``get_tradable_asset_pairs`` for ``cache_ttl`` seconds. If
+        ``cache_ttl`` is set to 0, do not cache.
+
+    cache_path : str, optional (default=None)
+        Store cached results in the pickle file ``cache_path``, and load them
+        from it on initialization, so that they can be reused by later
+        sessions (as long as they have not expired). If None (default), keep
+        cached results in memory only.
+
+    cache_refresh : bool, optional (default=False)
+        If True, return expired cached results and refresh them in a
+        background thread. If False (default), query expired results again
+        before returning them.
+
+    coalesce : bool, optional (default=False)
+        If True, identical public queries issued concurrently (e.g. from
+        several threads) share one call to the Kraken API and its result.
+
+    coalesce_ttl : float, optional (default=0)
+        If ``coalesce`` is True, also share the result of a public query with
+        identical queries issued less than ``coalesce_ttl`` seconds after it
+        returned. If ``coalesce_ttl`` is set to 0, only share results of
+        queries in flight.
+
+    nonce_path : str, optional (default=None)
+        File storing the last nonce, so that nonces are strictly increasing
+        across all processes sharing an API key (and the file). If None
+        (default), nonces are strictly increasing within this process. See
+        ``pykrakenapi.nonce.NonceAllocator``.
+
+    timeline : pykrakenapi.Timeline, optional (default=None)
+        If given, record the latency of the phases (limiter, signing,
+        network, decoding, parsing) of each ``add_standard_order`` and
+        ``cancel_open_order`` call, keyed by its userref (txid). The hooks of
+        the timeline are installed on ``api``. If None (default), do not
+        record latencies.
+
+    profile : pykrakenapi.Timeline, optional (default=None)
+        If given, record the durations of the phases (limiter, network,
+        decoding, parsing, see ``pykrakenapi.Timeline``) of every query, e.g.
+        to find out whether a slow ``get_closed_orders`` call spends its time
+        on the network or on building DataFrames. Records are passed to the
+        ``callback`` of the timeline, a ``sample`` of the calls may be
+        recorded only. The hooks of the timeline are installed on ``api``.
+        If None (default), do not profile.
+
+    reserve : dict, optional (default=None)
+        Call rate limit units reserved for higher priorities (see
+        ``priority``), by priority, e.g. ``{'normal': 2, 'bulk': 8}``: calls
+        of priority "normal" are blocked 2 units below the limit (leaving
+        them to "critical" calls), calls of priority "bulk" 8 units below
+        the limit. If None (default), no units are reserved.
 
     Attributes
     ----------
     api : krakenex.API
         See Parameters.
 
+    nonce : pykrakenapi.nonce.NonceAllocator
+        Allocator of the nonces of private queries.
+
+    Notes
+    -----
+    The call rate limiter is thread-safe. Share one instance between threads
+    to share one call rate budget.
+
+    Calls may be tagged as "critical", "normal" (default) or "bulk" (see
+    ``priority``). While a call waits for the call rate limiter (see
+    ``crl_sleep``), calls of lower priority are blocked, so that waiting
+    calls are admitted in order of priority. Together with ``reserve``, this
+    keeps e.g. order status polls fast while a history export uses the
+    leftover capacity.
+
+    A call that reached the limit waits until the counter decreases (by 1
+    every 1 to 3 seconds, depending on ``tier``), or until a waiting call of
+    higher priority is admitted, before it is retried. Even a "critical" call
+    may therefore wait up to a few seconds; ``reserve`` units for it if it
+    needs a low latency.
+
+    Queries may be sent concurrently, sharing ``api``: the ``_query`` of
+    ``krakenex.API`` is replaced by one that keeps each response local to
+    its query (``krakenex.API`` keeps it in a shared attribute).
+
+    Private queries may be sent concurrently (see ``parallel``): nonces are
+    allocated under a lock, so they are never repeated. Concurrent queries
+    may still reach Kraken out of nonce order, which Kraken rejects with
+    "EAPI:Invalid nonce" unless the API key has a nonce window (set in the
+    API key settings on kraken.com) wide enough to cover the reordering.
+
     """
 
-    def __init__(self, api, tier=3, retry=.5, crl_sleep=5):
+    def __init__(self, api, tier=3, retry=.5, crl_sleep=5, cache_ttl=0,
+                 cache_path=None, cache_refresh=False, coalesce=False,
+                 coalesce_ttl=0, nonce_path=None, timeline=None,
+                 profile=None, reserve=None):
 
         self.api = api
 
+        # responses local to each query, so that the transport can be shared
+        # between threads (krakenex.API)
+        if all(hasattr(self.api, attr) for attr in
+               ('_query', 'session', 'uri')):
+            self.api._query = _local_response_query(self.api)
+
+        # strictly increasing nonces, shared between threads (and processes)
+        self.nonce = NonceAllocator(nonce_path)
+        self.api._nonce = self.nonce
+
+        # latency timeline of the order path
+        self.timeline = timeline
+        if self.timeline is not None:
+            self.timeline.instrument(self.api)
+
+        # phase profile of all calls
+        self.profile = profile
+        if self.profile is not None:
+            self.profile.instrument(self.api)
+
         # api call rate limiter
         self.time_of_last_query = datetime.datetime.now()
         self.api_counter = 0
+        self._lock = threading.Lock()
+        # notified when the counter decreases or a waiting call is dequeued
+        self._counter_decreased = threading.Condition(self._lock)
 
         if tier == 0:
             self.limit = float('inf')
@@ -188,10 +649,49 @@ class KrakenAPI(object):
             self.limit = 20
             self.factor = 1  # down by 1 every one second
 
+        # priorities: capacity reserved for higher priorities, number of
+        # calls of each priority waiting for capacity
+        self.reserve = dict.fromkeys(PRIORITIES, 0)
+        for priority, units in (reserve or {}).items():
+            self._check_priority(priority)
+            self.reserve[priority] = units
+        self._waiting = dict.fromkeys(PRIORITIES, 0)
+        self._priorities = threading.local()
+
+        # per pair order rate counters (of batches of orders)
+        self.order_limit, self.order_decay = _ORDER_RATE_LIMITS.get(
+            tier, (None, None))
+        self._order_counters = {}
+        self._order_lock = threading.Lock()
+
         # retry timers
         self.retry = retry
         self.crl_sleep = crl_sleep
 
+        # metadata cache
+        self.cache_ttl = cache_ttl
+        self.cache_path = cache_path
+        self.cache_refresh = cache_refresh
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._cache_refreshing = set()
+        self._load_cache()
+
+        # query coalescing
+        self.coalesce = coalesce
+        self.coalesce_ttl = coalesce_ttl
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+        # pair and asset name lookup tables, pair specifications
+        self._pair_index = None
+        self._asset_index = None
+        self._pair_specs = None
+        self._index_built = {}
+        self._index_lock = threading.Lock()
+
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_server_time(self):
@@ -233,6 +733,9 @@ class KrakenAPI(object):
 
         return dt, unixtime
 
+    @metadatacache
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_asset_info(self, info=None, aclass=None, asset=None):
@@ -290,6 +793,9 @@ class KrakenAPI(object):
 
         return assets
 
+    @metadatacache
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_tradable_asset_pairs(self, info=None, pair=None):
@@ -365,6 +871,8 @@ class KrakenAPI(object):
 
         return pairs
 
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_ticker_information(self, pair):
@@ -424,6 +932,149 @@ class KrakenAPI(object):
 
         return ticker
 
+    def get_asset_info_batch(self, assets, info=None, aclass=None,
+                             workers=4, max_length=2000):
+        """Get asset info for many assets.
+
+        Return a ``pd.DataFrame`` of asset names and their info, for any number
+        of assets. The assets are packed into as few ``get_asset_info``
+        queries as the URL length allows, which are sent concurrently.
+
+        Parameters
+        ----------
+        assets : iterable of str
+            Assets to get info on (or a comma delimited list of assets).
+
+        info : ?, optional (default=None)
+            See get_asset_info.
+
+        aclass : str, optional (default=None)
+            See get_asset_info.
+
+        workers : int, optional (default=4)
+            Maximum number of queries sent concurrently.
+
+        max_length : int, optional (default=2000)
+            Maximum length of the (URL encoded) list of assets per query.
+
+        Returns
+        -------
+        assets : pd.DataFrame
+            See get_asset_info.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        calls = [(self.get_asset_info,
+                  {'info': info, 'aclass': aclass, 'asset': chunk})
+                 for chunk in _chunk_names(assets, max_length)]
+        assets = self._concat_results(self._run_concurrently(calls, workers))
+
+        return assets
+
+    def get_tradable_asset_pairs_batch(self, pairs, info=None, workers=4,
+                                       max_length=2000):
+        """Get tradable asset pairs for many pairs.
+
+        Return a ``pd.DataFrame`` of pair names and their info, for any number
+        of pairs. The pairs are packed into as few
+        ``get_tradable_asset_pairs`` queries as the URL length allows, which
+        are sent concurrently.
+
+        Parameters
+        ----------
+        pairs : iterable of str
+            Asset pairs to get info on (or a comma delimited list of pairs).
+
+        info : str, optional (default=None)
+            See get_tradable_asset_pairs.
+
+        workers : int, optional (default=4)
+            Maximum number of queries sent concurrently.
+
+        max_length : int, optional (default=2000)
+            Maximum length of the (URL encoded) list of pairs per query.
+
+        Returns
+        -------
+        pairs : pd.DataFrame
+            See get_tradable_asset_pairs.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        calls = [(self.get_tradable_asset_pairs, {'info': info, 'pair': chunk})
+                 for chunk in _chunk_names(pairs, max_length)]
+        pairs = self._concat_results(self._run_concurrently(calls, workers))
+
+        return pairs
+
+    def get_ticker_information_batch(self, pairs, workers=4,
+                                     max_length=2000):
+        """Get ticker information for many pairs.
+
+        Return a ``pd.DataFrame`` of pair names and their ticker info, for any
+        number of pairs. The pairs are packed into as few
+        ``get_ticker_information`` queries as the URL length allows, which
+        are sent concurrently.
+
+        Parameters
+        ----------
+        pairs : iterable of str
+            Asset pairs to get info on (or a comma delimited list of pairs).
+
+        workers : int, optional (default=4)
+            Maximum number of queries sent concurrently.
+
+        max_length : int, optional (default=2000)
+            Maximum length of the (URL encoded) list of pairs per query.
+
+        Returns
+        -------
+        ticker : pd.DataFrame
+            See get_ticker_information.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        calls = [(self.get_ticker_information, {'pair': chunk})
+                 for chunk in _chunk_names(pairs, max_length)]
+        ticker = self._concat_results(self._run_concurrently(calls, workers))
+
+        return ticker
+
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_ohlc_data(self, pair, interval=1, since=None):
@@ -493,7 +1144,7 @@ class KrakenAPI(object):
             raise KrakenAPIError(res['error'])
 
         # create dataframe
-        ohlc = pd.DataFrame(res['result'][pair])
+        ohlc = pd.DataFrame(self._pair_result(res['result'], pair))
         last = res['result']['last']
 
         # set time, column names
@@ -510,6 +1161,8 @@ class KrakenAPI(object):
 
         return ohlc, last
 
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_order_book(self, pair, count=100):
@@ -567,8 +1220,9 @@ class KrakenAPI(object):
             raise KrakenAPIError(res['error'])
 
         # create dataframe
-        asks = pd.DataFrame(res['result'][pair]['asks'])
-        bids = pd.DataFrame(res['result'][pair]['bids'])
+        book = self._pair_result(res['result'], pair)
+        asks = pd.DataFrame(book['asks'])
+        bids = pd.DataFrame(book['bids'])
 
         # column names
         cols = ['price', 'volume', 'time']
@@ -589,6 +1243,76 @@ class KrakenAPI(object):
 
         return asks, bids
 
+    @singleflight
+    @profiled
+    @crl_sleep
+    @callratelimiter('other')
+    def get_order_book_arrays(self, pair, count=100):
+        """Get order book (market depth) as arrays.
+
+        Return ``np.ndarray``'s for both asks and bids for a given pair,
+        sorted by price (best price first). Unlike ``get_order_book``, no
+        DataFrames are created, which makes this method suitable for frequent
+        polling (see ``pykrakenapi.OrderBook``).
+
+        Parameters
+        ----------
+        pair : str
+            Asset pair to get market depth for.
+
+        count : int, optional (default=100)
+            Maximum number of asks/bids. Per default, get the best 100 bids
+            and asks.
+
+        Returns
+        -------
+        asks : np.ndarray
+            The ask side table, in ascending order of price.
+            shape = (number of asks, 3)
+            columns = price, volume, time (unixtime)
+
+        bids : np.ndarray
+            The bid side table, in descending order of price.
+            shape = (number of bids, 3)
+            columns = price, volume, time (unixtime)
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        # create data dictionary
+        data = {arg: value for arg, value in locals().items() if
+                arg != 'self' and value is not None}
+
+        # query
+        res = self.api.query_public('Depth', data=data)
+
+        # check for error
+        if len(res['error']) > 0:
+            raise KrakenAPIError(res['error'])
+
+        # create arrays
+        book = self._pair_result(res['result'], pair)
+        asks = np.array(book['asks'], dtype=float).reshape(-1, 3)
+        bids = np.array(book['bids'], dtype=float).reshape(-1, 3)
+
+        # sort by price, best price first
+        asks = asks[np.argsort(asks[:, 0], kind='mergesort')]
+        bids = bids[np.argsort(-bids[:, 0], kind='mergesort')]
+
+        return asks, bids
+
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def get_recent_trades(self, pair, since=None):
@@ -646,7 +1370,7 @@ class KrakenAPI(object):
             raise KrakenAPIError(res['error'])
 
         # create dataframe
-        trades = pd.DataFrame(res['result'][pair])
+        trades = pd.DataFrame(self._pair_result(res['result'], pair))
         trades.columns = [
             'price', 'volume', 'time', 'buy_sell', 'market_limit', 'misc'
         ]
@@ -669,6 +1393,8 @@ class KrakenAPI(object):
 
         return trades, last
 
+    @singleflight
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_recent_spread_data(self, pair, since=None):
@@ -730,7 +1456,7 @@ class KrakenAPI(object):
             raise KrakenAPIError(res['error'])
 
         # create dataframe
-        spread = pd.DataFrame(res['result'][pair])
+        spread = pd.DataFrame(self._pair_result(res['result'], pair))
         spread.columns = ['time', 'bid', 'ask']
 
         # time
@@ -748,6 +1474,7 @@ class KrakenAPI(object):
 
         return spread, last
 
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_account_balance(self, otp=None):
@@ -794,6 +1521,7 @@ class KrakenAPI(object):
 
         return balance
 
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def get_trade_balance(self, aclass='currency', asset='ZEUR', otp=None):
@@ -862,6 +1590,7 @@ class KrakenAPI(object):
 
         return tradebalance
 
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_open_orders(self, trades=False, userref=None, otp=None):
@@ -966,6 +1695,7 @@ class KrakenAPI(object):
 
         return openorders
 
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_closed_orders(self, trades=False, userref=None, start=None,
@@ -1037,23 +1767,25 @@ class KrakenAPI(object):
         if len(res['error']) > 0:
             raise KrakenAPIError(res['error'])
 
-        # create dataframe
+        # create dataframe (empty if no orders match)
         closed = pd.DataFrame(res['result']['closed']).T
-        descr = closed.descr.apply(pd.Series)
-        descr.columns = ['descr_{}'.format(col) for col in descr.columns]
-        del closed['descr']
-        closed = pd.concat((closed, descr), axis=1)
-        for col in ['closetm', 'expiretm', 'opentm', 'starttm']:
-            closed.loc[:, col] = closed[col].astype(int)
-        for col in ['cost', 'fee', 'price', 'vol', 'vol_exec', 'descr_price',
-                    'descr_price2']:
-            closed.loc[:, col] = closed[col].astype(float)
+        if len(closed) > 0:
+            descr = closed.descr.apply(pd.Series)
+            descr.columns = ['descr_{}'.format(col) for col in descr.columns]
+            del closed['descr']
+            closed = pd.concat((closed, descr), axis=1)
+            for col in ['closetm', 'expiretm', 'opentm', 'starttm']:
+                closed.loc[:, col] = closed[col].astype(int)
+            for col in ['cost', 'fee', 'price', 'vol', 'vol_exec',
+                        'descr_price', 'descr_price2']:
+                closed.loc[:, col] = closed[col].astype(float)
 
         # count
         count = res['result']['count']
 
         return closed, count
 
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def query_orders_info(self, txid, trades=False, userref=None, otp=None):
@@ -1119,6 +1851,7 @@ class KrakenAPI(object):
 
         return orders
 
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def get_trades_history(self, type='all', trades=False, start=None,
@@ -1239,6 +1972,7 @@ class KrakenAPI(object):
 
         return trades, count
 
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def query_trades_info(self, txid, trades=False, otp=None):
@@ -1303,6 +2037,7 @@ class KrakenAPI(object):
 
         return trades
 
+    @profiled
     @crl_sleep
     @callratelimiter('other')
     def get_open_positions(self, txid=None, docalcs=False, otp=None):
@@ -1381,6 +2116,7 @@ class KrakenAPI(object):
 
         return openpositions
 
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def get_ledgers_info(self, aclass=None, asset=None, type='all', start=None,
@@ -1478,6 +2214,7 @@ class KrakenAPI(object):
 
         return ledgers, count
 
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def query_ledgers(self, id, otp=None):
@@ -1540,6 +2277,7 @@ class KrakenAPI(object):
 
         return ledgers
 
+    @profiled
     @crl_sleep
     @callratelimiter('ledger/trade history')
     def get_trade_volume(self, pair=None, fee_info=True, otp=None):
@@ -1644,6 +2382,106 @@ class KrakenAPI(object):
 
         return currency, volume, fees, fees_maker
 
+    def validate_order(self, pair, type, ordertype, volume, price=None,
+                       price2=None, leverage=None, oflags=None):
+        """Validate and round an order locally.
+
+        Check an order against the specifications of its asset pair (see
+        ``get_tradable_asset_pairs``) and return its price(s) rounded to the
+        pair's price precision (``pair_decimals``, or ``tick_size`` if given)
+        and its volume rounded down to the pair's lot precision
+        (``lot_decimals``), without querying Kraken (except for the pair
+        specifications, which are queried once).
+
+        Parameters
+        ----------
+        pair, type, ordertype, volume, price, price2, leverage, oflags
+            See add_standard_order.
+
+        Returns
+        -------
+        order : dict
+            The given arguments (except None), with price, price2 and volume
+            as rounded strings. Relative prices (+, -, #, %) are not rounded.
+
+        Raises
+        ------
+        OrderValidationError
+            The order would be rejected by Kraken: unknown pair, pair not
+            accepting orders, unknown type or order type, missing price,
+            volume below ``ordermin`` or cost below ``costmin``.
+
+        HTTPError
+            An HTTP error occurred (while querying pair specifications).
+
+        KrakenAPIError
+            A kraken.com API error occurred (while querying pair
+            specifications).
+
+        CallRateLimitError
+            The call rate limiter blocked the query (of pair specifications).
+
+        """
+
+        order = {arg: value for arg, value in locals().items() if
+                 arg != 'self' and value is not None}
+
+        try:
+            spec = self._resolve_name(pair, '_pair_specs',
+                                      self._build_pair_specs)
+        except KeyError:
+            raise OrderValidationError('unknown pair: {}'.format(pair))
+
+        if spec.get('status', 'online') == 'cancel_only':
+            raise OrderValidationError(
+                'pair {} only accepts cancellations'.format(pair))
+        if type not in ('buy', 'sell'):
+            raise OrderValidationError('unknown type: {}'.format(type))
+        if ordertype not in _ORDERTYPES:
+            raise OrderValidationError(
+                'unknown ordertype: {}'.format(ordertype))
+
+        # prices
+        if _ORDERTYPES[ordertype] >= 1 and price is None:
+            raise OrderValidationError(
+                'ordertype {} requires price'.format(ordertype))
+        if _ORDERTYPES[ordertype] == 2 and price2 is None:
+            raise OrderValidationError(
+                'ordertype {} requires price2'.format(ordertype))
+        for arg in ('price', 'price2'):
+            if arg in order and _is_absolute(order[arg]):
+                order[arg] = _round_price(order[arg], spec)
+
+        # volume (in quote currency for viqc, which is not checked)
+        viqc = oflags is not None and 'viqc' in oflags.split(',')
+        if not viqc:
+            # round down to the lot decimals (in decimal arithmetic, so
+            # that volumes on the grid are kept as they are)
+            volume = Decimal(str(volume)).quantize(
+                Decimal(1).scaleb(-int(spec['lot_decimals'])),
+                rounding=ROUND_DOWN)
+            if volume <= 0 and not (volume == 0 and leverage is not None):
+                raise OrderValidationError(
+                    'volume must be positive: {}'.format(order['volume']))
+            ordermin = spec.get('ordermin')
+            if ordermin is not None and 0 < volume < Decimal(str(ordermin)):
+                raise OrderValidationError(
+                    'volume {} below ordermin {} of {}'.format(
+                        volume, ordermin, pair))
+            costmin = spec.get('costmin')
+            if (costmin is not None and ordertype == 'limit' and
+                    _is_absolute(order['price']) and
+                    0 < volume * Decimal(order['price']) <
+                    Decimal(str(costmin))):
+                raise OrderValidationError(
+                    'cost {} below costmin {} of {}'.format(
+                        volume * Decimal(order['price']), costmin, pair))
+            order['volume'] = '{:f}'.format(volume)
+
+        return order
+
+    @timed('userref')
+    @profiled
     def add_standard_order(self, pair, type, ordertype, volume, price=None,
                            price2=None, leverage=None, oflags=None, starttm=0,
                            expiretm=0, userref=None, validate=True,
@@ -1804,6 +2642,122 @@ class KrakenAPI(object):
 
         return res['result']
 
+    def add_standard_orders(self, orders, workers=8, interval=0,
+                            check=False, pace=True):
+        """UNTESTED!
+
+        Add standard orders concurrently.
+
+        Submit a batch of standard orders (see ``add_standard_order``) and
+        return the result and timings of each order. Orders for different
+        pairs are submitted concurrently; orders for the same pair are
+        submitted one after another, in the given order, at most one every
+        ``interval`` seconds, and paced to Kraken's per pair order rate limit
+        (see ``pace``). A failed order does not stop the others.
+
+        Parameters
+        ----------
+        orders : iterable of dict or pd.DataFrame
+            The orders, as keyword arguments of ``add_standard_order`` (one
+            dict, or one row, per order). As for ``add_standard_order``,
+            ``validate`` defaults to True, i.e. orders are only validated
+            unless validate=False is given.
+
+        workers : int, optional (default=8)
+            Maximum number of orders submitted concurrently.
+
+        interval : float, optional (default=0)
+            Minimum number of seconds between the submissions of two orders
+            for the same pair, to stay within Kraken's per pair order rate
+            limits.
+
+        check : bool, optional (default=False)
+            If True, validate and round each order locally before submitting
+            it (see ``validate_order``). Orders failing the local validation
+            are not submitted (their error is reported, without timings).
+
+        pace : bool, optional (default=True)
+            If True, keep a per pair order rate counter (with the threshold
+            and decrease of ``tier``, see Notes) and delay orders that would
+            exceed it, and retry orders rejected with "EOrder:Rate limit
+            exceeded" up to 5 times, after 1, 2, 4, 8 and 16 seconds. Orders
+            that are only validated are not counted. If False, orders are
+            sent without delay (except ``interval``).
+
+        Returns
+        -------
+        orders : pd.DataFrame
+            index = position of the order in ``orders``
+            pair, type, ordertype, volume, price, userref = see
+                add_standard_order
+            descr = order description (if successful)
+            txid = array of transaction ids (if successful)
+            error = error message (if not successful)
+            sent = unixtime the order was sent
+            received = unixtime the response was received
+            elapsed = seconds between sent and received
+
+        Notes
+        -----
+        Orders are sent concurrently, so they may reach Kraken out of nonce
+        order. See Notes of ``KrakenAPI``.
+
+        Kraken's per pair order rate counters have a threshold of 60, 125 or
+        180 and decrease by 1, 2.34 or 3.75 per second for tier 2, 3 or 4.
+        Each order adds 1. The counters are shared with other sessions and
+        orders not placed by ``add_standard_orders``, which is why rejected
+        orders are retried.
+
+        """
+
+        if isinstance(orders, pd.DataFrame):
+            orders = orders.to_dict('records')
+        orders = [{arg: value for arg, value in order.items()
+                   if value is not None and value == value}
+                  for order in orders]
+
+        # local validation
+        results = [None] * len(orders)
+        if check:
+            args = inspect.signature(self.validate_order).parameters
+            for i, order in enumerate(orders):
+                try:
+                    order.update(self.validate_order(
+                        **{arg: value for arg, value in order.items()
+                           if arg in args}))
+                except OrderValidationError as err:
+                    results[i] = {'result': None, 'error': str(err),
+                                  'sent': None, 'received': None,
+                                  'elapsed': None}
+
+        submit = [i for i, result in enumerate(results) if result is None]
+        calls = [(orders[i]['pair'], self.add_standard_order, orders[i])
+                 for i in submit]
+        costs = None
+        if pace:
+            costs = [0 if orders[i].get('validate', True) else 1
+                     for i in submit]
+        for i, result in zip(submit, self._run_by_pair(
+                calls, workers, interval, costs)):
+            results[i] = result
+
+        # create dataframe
+        cols = ['pair', 'type', 'ordertype', 'volume', 'price', 'userref']
+        rows = []
+        for order, result in zip(orders, results):
+            row = {col: order.get(col) for col in cols}
+            res = result.pop('result') or {}
+            row['descr'] = res.get('descr')
+            row['txid'] = res.get('txid')
+            row.update(result)
+            rows.append(row)
+        orders = pd.DataFrame(rows, columns=cols + [
+            'descr', 'txid', 'error', 'sent', 'received', 'elapsed'])
+
+        return orders
+
+    @timed('txid')
+    @profiled
     def cancel_open_order(self, txid, otp=None):
         """UNTESTED!
 
@@ -1854,21 +2808,318 @@ class KrakenAPI(object):
 
         return res['result']
 
+    def cancel_open_orders(self, txids=None, pair=None, type=None,
+                           userref=None, workers=8, interval=0, otp=None,
+                           pace=True):
+        """UNTESTED!
+
+        Cancel open orders concurrently.
+
+        Cancel the given open orders, or all open orders matching the given
+        filters (see ``get_open_orders``), and report which cancellations
+        were confirmed and which are still pending. Cancellations are sent
+        concurrently for different pairs, and one after another (at most one
+        every ``interval`` seconds) for the same pair.
+
+        Parameters
+        ----------
+        txids : iterable of str, optional (default=None)
+            Transaction ids of the orders to cancel. If None, cancel all open
+            orders matching ``pair``, ``type`` and ``userref``.
+
+        pair : str, optional (default=None)
+            Only cancel open orders of this asset pair (any name accepted by
+            ``resolve_pair``).
+
+        type : str, optional (default=None)
+            Only cancel open orders of this type (buy/sell).
+
+        userref : int, optional (default=None)
+            Only cancel open orders with this user reference id.
+
+        workers : int, optional (default=8)
+            Maximum number of cancellations sent concurrently.
+
+        interval : float, optional (default=0)
+            Minimum number of seconds between the cancellations of two orders
+            for the same pair, to stay within Kraken's per pair order rate
+            limits.
+
+        otp : str
+            Two-factor password (if two-factor enabled, otherwise not required)
+
+        pace : bool, optional (default=True)
+            If True, keep a per pair order rate counter (see Notes) and delay
+            cancellations that would exceed it, and retry cancellations
+            rejected with "EOrder:Rate limit exceeded" up to 5 times, after 1,
+            2, 4, 8 and 16 seconds. If False, cancellations are sent without
+            delay (except ``interval``).
+
+        Returns
+        -------
+        canceled : pd.DataFrame
+            index = txid
+            pair = asset pair (if known)
+            count = number of orders canceled
+            pending = whether the order is pending cancellation
+            status = canceled (confirmed), pending or failed
+            error = error message (if failed)
+            sent = unixtime the cancellation was sent
+            received = unixtime the response was received
+            elapsed = seconds between sent and received
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred (while querying open orders).
+
+        KrakenAPIError
+            A kraken.com API error occurred (while querying open orders).
+
+        CallRateLimitError
+            The call rate limiter blocked the query (of open orders).
+
+        Notes
+        -----
+        Canceling an order adds a penalty to Kraken's per pair order rate
+        counter (see Notes of ``add_standard_orders``) that depends on the age
+        of the order: 8 if younger than 5 seconds, down to 1 if younger than 5
+        minutes, none for older orders. The age is only known for open orders
+        queried by ``cancel_open_orders`` (i.e. if ``txids`` is None); orders
+        given by ``txids`` are not delayed, but still retried if rejected.
+
+        """
+
+        # resolve orders to cancel
+        opentm = {}
+        if txids is None:
+            openorders = self.get_open_orders(userref=userref, otp=otp)
+            openorders = openorders.get('open', {})
+            if pair is not None:
+                resolved = self._resolve_pair_or_name(pair)
+            pairs = {}
+            for txid, order in openorders.items():
+                descr = order.get('descr', {})
+                if pair is not None and descr.get('pair') != pair and (
+                        descr.get('pair') is None or
+                        self._resolve_pair_or_name(
+                            descr['pair']) != resolved):
+                    continue
+                if type is not None and descr.get('type') != type:
+                    continue
+                pairs[txid] = descr.get('pair')
+                if order.get('opentm') is not None:
+                    opentm[txid] = float(order['opentm'])
+        else:
+            if isinstance(txids, str):
+                txids = txids.split(',')
+            pairs = {txid: None for txid in txids}
+
+        # orders of unknown pairs are not throttled together
+        calls = [(order_pair if order_pair is not None else txid,
+                  self.cancel_open_order, {'txid': txid, 'otp': otp})
+                 for txid, order_pair in pairs.items()]
+        costs = None
+        if pace:
+            # penalty by age of the order (at the time of the query)
+            now = time.time()
+            costs = [next((penalty for age, penalty in _CANCEL_PENALTIES
+                           if now - opentm[txid] < age), 0)
+                     if txid in opentm else 0 for txid in pairs]
+        results = self._run_by_pair(calls, workers, interval, costs)
+
+        # create dataframe
+        rows = []
+        for (txid, order_pair), result in zip(pairs.items(), results):
+            res = result.pop('result') or {}
+            row = {'txid': txid, 'pair': order_pair,
+                   'count': int(res.get('count', 0)),
+                   'pending': bool(res.get('pending', False))}
+            if result['error'] is not None:
+                row['status'] = 'failed'
+            elif row['pending']:
+                row['status'] = 'pending'
+            else:
+                row['status'] = 'canceled'
+            row.update(result)
+            rows.append(row)
+        canceled = pd.DataFrame(rows, columns=[
+            'txid', 'pair', 'count', 'pending', 'status', 'error', 'sent',
+            'received', 'elapsed'])
+        canceled.set_index('txid', inplace=True)
+
+        return canceled
+
+    def parallel(self, calls, workers=4):
+        """Run queries concurrently.
+
+        Run any number of queries (public or private) in a thread pool and
+        return their results in order. All queries share the call rate limiter
+        of this instance, and private queries get strictly increasing nonces
+        (see Notes of ``KrakenAPI``).
+
+        Parameters
+        ----------
+        calls : iterable of (str or callable, dict)
+            The queries, as pairs of a method (or method name) of this
+            instance and its keyword arguments, e.g.
+            ``[('get_trades_history', {'start': start}),
+            ('get_ledgers_info', {'start': start}),
+            ('get_account_balance', {})]``.
+
+        workers : int, optional (default=4)
+            Maximum number of queries sent concurrently.
+
+        Returns
+        -------
+        results : list
+            The result of each query.
+
+        Raises
+        ------
+        HTTPError
+            An HTTP error occurred.
+
+        KrakenAPIError
+            A kraken.com API error occurred.
+
+        CallRateLimitError
+            The call rate limiter blocked the query.
+
+        """
+
+        calls = [(getattr(self, func) if isinstance(func, str) else func,
+                  kwargs) for func, kwargs in calls]
+        results = self._run_concurrently(calls, workers)
+
+        return results
+
+    @contextmanager
+    def priority(self, priority):
+        """Tag the queries of the current thread with a priority.
+
+        Within the context, queries of the current thread (and of the worker
+        threads it starts, e.g. in ``parallel``) are admitted by the call
+        rate limiter with the given priority, see ``reserve`` and the Notes
+        of ``KrakenAPI``. Queries not tagged have the priority "normal".
+
+        Parameters
+        ----------
+        priority : str
+            One of "critical", "normal" or "bulk".
+
+        Raises
+        ------
+        ValueError
+            The priority is unknown.
+
+        Examples
+        --------
+        >>> k = KrakenAPI(api, reserve={'normal': 2, 'bulk': 8})
+        >>> with k.priority('bulk'):
+        ...     ledgers, count = k.get_ledgers_info(start=start)
+        >>> with k.priority('critical'):
+        ...     openorders = k.get_open_orders()
+
+        """
+
+        self._check_priority(priority)
+
+        previous = self._current_priority()
+        self._priorities.priority = priority
+        try:
+            yield
+        finally:
+            self._priorities.priority = previous
+
+    def resolve_pair(self, pair):
+        """Return the canonical name of an asset pair.
+
+        Look up the name Kraken uses to key results of a given asset pair
+        (e.g. 'XXBTZEUR' for 'XBTEUR', 'XBT/EUR' or 'xbteur'). The lookup
+        table is built from ``get_tradable_asset_pairs`` on first use, and
+        rebuilt for unknown names (at most once a minute).
+
+        Parameters
+        ----------
+        pair : str
+            Canonical name, altname, wsname or base/quote ids (concatenated or
+            separated by '/') of an asset pair, in any case.
+
+        Returns
+        -------
+        pair : str
+            The canonical name of the asset pair.
+
+        Raises
+        ------
+        KeyError
+            The asset pair is unknown.
+
+        """
+
+        pair = self._resolve_name(pair, '_pair_index', self._build_pair_index)
+
+        return pair
+
+    def resolve_asset(self, asset):
+        """Return the canonical name of an asset.
+
+        Look up the name Kraken uses to key results of a given asset (e.g.
+        'XXBT' for 'XBT' or 'xbt'). The lookup table is built from
+        ``get_asset_info`` on first use, and rebuilt for unknown names (at
+        most once a minute).
+
+        Parameters
+        ----------
+        asset : str
+            Canonical name or altname of an asset, in any case.
+
+        Returns
+        -------
+        asset : str
+            The canonical name of the asset.
+
+        Raises
+        ------
+        KeyError
+            The asset is unknown.
+
+        """
+
+        asset = self._resolve_name(
+            asset, '_asset_index', self._build_asset_index)
+
+        return asset
+
     def datetime_to_unixtime(self, dt):
         """Return unixtime for a given datetime.
 
         Parameters
         ----------
-        dt : datetime.datetime
-            The datetime to convert to unixtime.
+        dt : datetime.datetime or array_like of datetimes
+            The datetime(s) to convert to unixtime. Arrays (e.g. a
+            ``pd.DatetimeIndex``, a datetime ``pd.Series`` or a
+            ``np.datetime64`` array) are converted at once; timezone aware
+            datetimes are converted to UTC first.
 
         Returns
         -------
-        unixtime : int
-            The unixtime corresponding to the given datetime.
+        unixtime : int or np.ndarray
+            The unixtime corresponding to the given datetime, or an int64
+            array of unixtimes corresponding to the given datetimes.
 
         """
 
+        # vectorized
+        if np.ndim(dt) > 0:
+            dt = pd.DatetimeIndex(dt)
+            if dt.tz is not None:
+                dt = dt.tz_convert(None)
+            unixtime = np.asarray(dt.values.astype('datetime64[s]'),
+                                  dtype=np.int64)
+            return unixtime
+
         delta_t = (dt - datetime.datetime(1970, 1, 1)).total_seconds()
         unixtime = int(delta_t)
 
@@ -1879,26 +3130,356 @@ class KrakenAPI(object):
 
         Parameters
         ----------
-        unixtime : int
-            The unixtime to convert to datetime.
+        unixtime : int or array_like of int
+            The unixtime(s) to convert to datetime. Arrays are converted at
+            once.
 
         Returns
         -------
-        datetime : datetime.datetime
-            The datetime (UTC) corresponding to the given unixtime.
+        datetime : datetime.datetime or pd.DatetimeIndex
+            The datetime (UTC) corresponding to the given unixtime, or the
+            datetimes (UTC) corresponding to the given unixtimes.
 
         """
 
+        # vectorized
+        if np.ndim(unixtime) > 0:
+            dt = pd.to_datetime(np.asarray(unixtime), unit='s')
+            return dt
+
         dt = datetime.datetime(1970, 1, 1) + datetime.timedelta(0, unixtime)
 
         return dt
 
+    def clear_cache(self):
+        """Clear the metadata cache.
+
+        Remove all cached results (and the cache file, if ``cache_path`` is
+        set), so that the next queries are sent to the Kraken API. Also drop
+        the pair specifications used by ``validate_order``.
+
+        """
+
+        with self._cache_lock:
+            self._cache = {}
+            if self.cache_path is not None and os.path.exists(
+                    self.cache_path):
+                os.remove(self.cache_path)
+
+        with self._index_lock:
+            self._pair_specs = None
+
+    def _load_cache(self):
+
+        # load results cached by a previous session
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                self._cache = pickle.load(f)
+        except Exception as err:
+            print('could not load cache file {} |'.format(self.cache_path),
+                  err)
+
+    def _store_cache(self, key, result):
+
+        with self._cache_lock:
+            self._cache[key] = (time.time(), result.copy())
+
+            # write to a temporary file, then rename it
+            if self.cache_path is not None:
+                tmp = self.cache_path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    pickle.dump(self._cache, f)
+                os.replace(tmp, self.cache_path)
+
+    def _refresh_cache(self, key, func, args, kwargs):
+
+        # refresh an expired result in a background thread (once)
+        with self._cache_lock:
+            if key in self._cache_refreshing:
+                return
+            self._cache_refreshing.add(key)
+
+        def refresh():
+            try:
+                result = func(*args, **kwargs)
+                self._store_cache(key, result)
+            except Exception as err:
+                print('could not refresh cached {} |'.format(key[0]), err)
+            finally:
+                with self._cache_lock:
+                    self._cache_refreshing.discard(key)
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+
+    def _pair_result(self, result, pair):
+
+        # results are keyed by the canonical pair name
+        try:
+            return result[pair]
+        except KeyError:
+            return result[self.resolve_pair(pair)]
+
+    def _resolve_name(self, name, attr, build):
+
+        # build the lookup table on first use, rebuild it once for unknown
+        # names (e.g. newly listed pairs), but at most once every
+        # _INDEX_REBUILD_INTERVAL seconds, so that lookups of unknown names
+        # do not spend the call rate budget
+        for rebuild in (False, True):
+            with self._index_lock:
+                if getattr(self, attr) is None or (
+                        rebuild and time.time() - self._index_built[attr] >=
+                        _INDEX_REBUILD_INTERVAL):
+                    setattr(self, attr, build())
+                    self._index_built[attr] = time.time()
+                elif rebuild:
+                    raise KeyError(name)
+                index = getattr(self, attr)
+            try:
+                return index[name.upper()]
+            except KeyError:
+                if rebuild:
+                    raise
+
+    def _resolve_pair_or_name(self, pair):
+
+        # canonical name of a pair, or the name itself if it is unknown
+        try:
+            return self.resolve_pair(pair)
+        except KeyError:
+            return pair
+
+    def _build_pair_index(self, pairs=None):
+
+        if pairs is None:
+            pairs = self.get_tradable_asset_pairs()
+        bases = pairs.base.astype(str)
+        quotes = pairs.quote.astype(str)
+
+        # canonical names first, then alternative names (dark pool pairs
+        # share their base and quote with the regular pairs)
+        keys = [pairs.index.to_series(), pairs.altname]
+        if 'wsname' in pairs.columns:
+            keys.append(pairs.wsname)
+        regular = ~pairs.index.str.endswith('.d')
+        keys.append((bases + quotes)[regular])
+        keys.append((bases + '/' + quotes)[regular])
+
+        index = {}
+        for names in keys:
+            for name, pair in zip(names, names.index):
+                if isinstance(name, str):
+                    index.setdefault(name.upper(), pair)
+
+        return index
+
+    def _build_pair_specs(self):
+
+        pairs = self.get_tradable_asset_pairs()
+
+        # specifications of each pair, under all names of the pair
+        specs = {name: pairs.loc[pair].dropna().to_dict()
+                 for name, pair in self._build_pair_index(pairs).items()}
+
+        return specs
+
+    def _build_asset_index(self):
+
+        assets = self.get_asset_info()
+
+        index = {}
+        for names in (assets.index, assets.altname):
+            for name, asset in zip(names, assets.index):
+                if isinstance(name, str):
+                    index.setdefault(name.upper(), asset)
+
+        return index
+
+    def _run_concurrently(self, calls, workers):
+
+        # call (func, kwargs) pairs in a thread pool, return their results in
+        # order (or raise the first error)
+        if len(calls) == 1:
+            func, kwargs = calls[0]
+            return [func(**kwargs)]
+
+        # workers inherit the priority of the calling thread
+        priority = self._current_priority()
+
+        def call(func, kwargs):
+            with self.priority(priority):
+                return func(**kwargs)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(call, func, kwargs)
+                       for func, kwargs in calls]
+            results = [future.result() for future in futures]
+
+        return results
+
+    def _run_by_pair(self, calls, workers, interval, costs=None):
+
+        # call (pair, func, kwargs) triples, concurrently for different pairs
+        # and one after another (at least ``interval`` seconds apart) for the
+        # same pair; return the result (or error) and timings of each call.
+        # If ``costs`` (per call) are given, pace the calls of each pair to
+        # the per pair order rate limit, and retry calls rejected by it
+        by_pair = {}
+        for i, (pair, func, kwargs) in enumerate(calls):
+            by_pair.setdefault(pair, []).append((i, func, kwargs))
+
+        results = [None] * len(calls)
+
+        def run(pair_calls):
+            for n, (i, func, kwargs) in enumerate(pair_calls):
+                if n > 0 and interval > 0:
+                    time.sleep(max(0, results[pair_calls[n-1][0]]['sent'] +
+                                   interval - time.time()))
+                pair = calls[i][0]
+                for attempt in range(_ORDER_RATE_RETRIES + 1):
+                    if costs is not None:
+                        self._pace_order(pair, costs[i])
+                    result = {'result': None, 'error': None}
+                    result['sent'] = time.time()
+                    # any error (e.g. a timeout) only fails this call
+                    try:
+                        result['result'] = func(**kwargs)
+                    except Exception as err:
+                        result['error'] = str(err)
+                    result['received'] = time.time()
+                    result['elapsed'] = result['received'] - result['sent']
+                    if (costs is None or result['error'] is None or
+                            'EOrder:Rate limit exceeded' not in
+                            result['error'] or
+                            attempt == _ORDER_RATE_RETRIES):
+                        break
+                    self._saturate_order_counter(pair)
+                    time.sleep(2 ** attempt)
+                results[i] = result
+
+        self._run_concurrently(
+            [(run, {'pair_calls': pair_calls})
+             for pair_calls in by_pair.values()], workers)
+
+        return results
+
+    def _order_counter(self, pair, now):
+
+        # per pair order rate counter, decreased since its last update
+        counter, updated = self._order_counters.get(pair, (0., now))
+
+        return max(0., counter - (now - updated) * self.order_decay)
+
+    def _pace_order(self, pair, cost):
+
+        # wait until the order rate counter of pair has room for cost, then
+        # increase it by cost
+        if self.order_limit is None or cost == 0:
+            return
+        while True:
+            with self._order_lock:
+                now = time.time()
+                counter = self._order_counter(pair, now)
+                wait = (counter + cost - self.order_limit) / self.order_decay
+                if wait <= 0:
+                    self._order_counters[pair] = (counter + cost, now)
+                    return
+            time.sleep(wait)
+
+    def _saturate_order_counter(self, pair):
+
+        # Kraken rejected an order of pair: its counter (shared with other
+        # sessions) is at the limit
+        if self.order_limit is None:
+            return
+        with self._order_lock:
+            now = time.time()
+            counter = max(self._order_counter(pair, now), self.order_limit)
+            self._order_counters[pair] = (counter, now)
+
+    def _concat_results(self, results):
+
+        # merge frames indexed by asset/pair name, keep the first occurrence
+        if len(results) == 0:
+            return pd.DataFrame()
+        results = pd.concat(results, axis=0)
+        results = results[~results.index.duplicated(keep='first')]
+
+        return results
+
+    def _increase_api_counter(self, incr):
+
+        # decrease api counter, then increase it by ``incr`` if the limit
+        # (minus the units reserved for higher priorities) is not reached yet
+        # and no call of higher priority is waiting (atomically, the counter
+        # is shared between threads)
+        priority = self._current_priority()
+        with self._lock:
+            self._decrease_api_counter()
+            for other in PRIORITIES:
+                if other == priority:
+                    break
+                if self._waiting[other] > 0:
+                    return False
+            if self.api_counter < self.limit - self.reserve[priority]:
+                self.api_counter += incr
+                return True
+            return False
+
+    def _current_priority(self):
+
+        return getattr(self._priorities, 'priority', 'normal')
+
+    def _check_priority(self, priority):
+
+        if priority not in PRIORITIES:
+            raise ValueError('unknown priority {} (one of {})'.format(
+                priority, ', '.join(PRIORITIES)))
+
+    def _enqueue(self):
+
+        # register a call of the current priority waiting for capacity
+        priority = self._current_priority()
+        with self._lock:
+            self._waiting[priority] += 1
+
+        return priority
+
+    def _dequeue(self, priority):
+
+        # calls of lower priority may be admitted now
+        with self._lock:
+            self._waiting[priority] -= 1
+            self._counter_decreased.notify_all()
+
+    def _wait_for_counter(self, timeout):
+
+        # wait until the api counter decreases (next decrement, or notified by
+        # another thread), or a waiting call is dequeued, at most ``timeout``
+        # seconds
+        with self._lock:
+            self._decrease_api_counter()
+            decrement = (self.time_of_last_query - datetime.datetime.now() +
+                         datetime.timedelta(seconds=self.factor))
+            self._counter_decreased.wait(
+                min(timeout, max(0, decrement.total_seconds())))
+
     def _decrease_api_counter(self):
 
-        # decrease api counter, update time of last query
+        # decrease api counter, update time of last query (only by the
+        # decrements counted, so that frequent attempts, e.g. of several
+        # waiting calls, do not stop the counter from decreasing)
         now = datetime.datetime.now()
-        decr = int((now - self.time_of_last_query).seconds / self.factor)
-        self.api_counter -= decr
-        if self.api_counter < 0:
+        decr = int((now - self.time_of_last_query).total_seconds() /
+                   self.factor)
+        if decr > 0:
+            self.api_counter -= decr
+            self.time_of_last_query += datetime.timedelta(
+                seconds=decr * self.factor)
+            self._counter_decreased.notify_all()
+        if self.api_counter <= 0:
             self.api_counter = 0
-        self.time_of_last_query = now
+            self.time_of_last_query = now
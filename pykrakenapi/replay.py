@@ -0,0 +1,255 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Recording and replaying Kraken API responses.
+
+This module contains the classes ``RecordingAPI``, which records the raw
+responses of a transport (e.g. ``krakenex.API``) to a gzipped JSON lines
+file, and ``ReplayAPI``, which serves the recorded responses again, so that
+sessions can be reproduced offline.
+
+>>> help(RecordingAPI)
+>>> help(ReplayAPI)
+
+"""
+
+import collections
+import gzip
+import json
+import threading
+import time
+
+
+# arguments that differ between otherwise identical queries
+VOLATILE_ARGS = ['nonce', 'otp']
+
+
+def _query_key(kind, method, data):
+
+    data = {arg: value for arg, value in (data or {}).items()
+            if arg not in VOLATILE_ARGS}
+
+    return json.dumps([kind, method, data], sort_keys=True, default=str)
+
+
+class RecordingAPI(object):
+    """Transport recording all queries and responses.
+
+    Wraps a transport (e.g. ``krakenex.API``) and appends each query (method
+    and arguments, without nonce and otp) and its raw response, with its
+    time and duration, as a JSON line to a gzipped file. All other
+    attributes (e.g. ``load_key``, ``_nonce``, ``session``) are those of the
+    wrapped transport.
+
+    Parameters
+    ----------
+    api : krakenex.API
+        The transport to record.
+
+    path : str
+        The file to append the records to (gzipped JSON lines).
+
+    Notes
+    -----
+    Responses of private queries (balances, orders, ledgers, ...) are
+    recorded as well; API keys are not.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI
+    >>> from pykrakenapi.replay import RecordingAPI
+    >>> api = RecordingAPI(krakenex.API(), 'session.jsonl.gz')
+    >>> k = KrakenAPI(api)
+    >>> trades, last = k.get_recent_trades('XXBTZEUR')
+    >>> api.close()
+
+    """
+
+    _attrs = ['api', 'path', '_file', '_lock']
+
+    def __init__(self, api, path):
+
+        self.api = api
+        self.path = path
+
+        self._file = gzip.open(path, 'at')
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+
+        # only called for attributes not found on the recorder
+        if name in self._attrs:
+            raise AttributeError(name)
+
+        return getattr(self.api, name)
+
+    def __setattr__(self, name, value):
+
+        # set hooks (e.g. _nonce) on the wrapped transport
+        if name in self._attrs:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.api, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def query_public(self, method, data=None, timeout=None):
+
+        return self._record('public', method, data, self.api.query_public,
+                            timeout)
+
+    def query_private(self, method, data=None, timeout=None):
+
+        return self._record('private', method, data, self.api.query_private,
+                            timeout)
+
+    def close(self):
+        """Close the file."""
+
+        with self._lock:
+            self._file.close()
+
+    def _record(self, kind, method, data, query, timeout):
+
+        # the transport may add the nonce to data
+        data = dict(data or {})
+        args = {arg: value for arg, value in data.items()
+                if arg not in VOLATILE_ARGS}
+
+        start = time.time()
+        response = query(method, data=data, timeout=timeout)
+        elapsed = time.time() - start
+
+        record = {'time': start, 'elapsed': elapsed, 'kind': kind,
+                  'method': method, 'data': args, 'response': response}
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+        return response
+
+
+class ReplayAPI(object):
+    """Transport replaying recorded responses.
+
+    Serves the responses recorded by ``RecordingAPI``. Each query is answered
+    by the next recorded response of an identical query (same method and
+    arguments, except nonce and otp), or else by the next recorded response
+    of the same method. Queries without recorded response are answered with
+    the error "EGeneral:No recorded response".
+
+    Parameters
+    ----------
+    path : str
+        The file of records (gzipped JSON lines), see ``RecordingAPI``.
+
+    speed : float, optional (default=None)
+        If given, each response is delayed by its recorded duration (the
+        latency of the query) divided by ``speed`` (1 = recorded latency, 10
+        = ten times faster). Only the latency is scaled: the gaps between the
+        recorded queries are not replayed, queries are answered whenever they
+        are made. If None (default), respond immediately.
+
+    loop : bool, optional (default=False)
+        If True, serve the recorded responses of a query again once they are
+        exhausted.
+
+    Examples
+    --------
+    >>> from pykrakenapi import KrakenAPI
+    >>> from pykrakenapi.replay import ReplayAPI
+    >>> k = KrakenAPI(ReplayAPI('session.jsonl.gz', speed=10), tier=0)
+    >>> trades, last = k.get_recent_trades('XXBTZEUR')
+
+    """
+
+    def __init__(self, path, speed=None, loop=False):
+
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+        with gzip.open(path, 'rt') as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+
+        self._lock = threading.Lock()
+        self.rewind()
+
+    def rewind(self):
+        """Serve the recorded responses from the start again."""
+
+        with self._lock:
+            self._queries = collections.defaultdict(collections.deque)
+            self._methods = collections.defaultdict(collections.deque)
+            for i, record in enumerate(self.records):
+                kind, method = record['kind'], record['method']
+                self._queries[_query_key(kind, method,
+                                         record['data'])].append(i)
+                self._methods[(kind, method)].append(i)
+            self._served = set()
+
+    def query_public(self, method, data=None, timeout=None):
+
+        return self._replay('public', method, data)
+
+    def query_private(self, method, data=None, timeout=None):
+
+        if data is None:
+            data = {}
+        data['nonce'] = self._nonce()
+
+        return self._replay('private', method, data)
+
+    def _nonce(self):
+
+        return int(1000*time.time())
+
+    def _replay(self, kind, method, data):
+
+        with self._lock:
+            i = self._next(self._queries[_query_key(kind, method, data)])
+            if i is None:
+                i = self._next(self._methods[(kind, method)])
+            if i is not None:
+                self._served.add(i)
+
+        if i is None:
+            return {'error': ['EGeneral:No recorded response']}
+
+        record = self.records[i]
+        if self.speed is not None:
+            time.sleep(record['elapsed'] / self.speed)
+
+        return record['response']
+
+    def _next(self, queue):
+
+        # next record of a queue not served yet (by the other queue)
+        while len(queue) > 0:
+            i = queue.popleft()
+            if self.loop:
+                queue.append(i)
+                return i
+            if i not in self._served:
+                return i
+
+        return None
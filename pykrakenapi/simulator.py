@@ -0,0 +1,731 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Simulated Kraken exchange.
+
+This module contains the class ``SimulatedAPI``, an in-process stand-in for
+``krakenex.API``, which serves market data of a synthetic (or replayed)
+market and matches orders locally, so that ``KrakenAPI`` can be exercised
+without network access.
+
+>>> help(SimulatedAPI)
+
+"""
+
+import collections
+import email.utils
+import threading
+import time
+
+import numpy as np
+
+from pykrakenapi.pykrakenapi import _CANCEL_PENALTIES, _ORDER_RATE_LIMITS
+
+
+# default pairs: name -> specification (and initial price)
+PAIRS = {
+    'XXBTZEUR': {'altname': 'XBTEUR', 'wsname': 'XBT/EUR', 'base': 'XXBT',
+                 'quote': 'ZEUR', 'pair_decimals': 1, 'lot_decimals': 8,
+                 'ordermin': '0.0001', 'price': 30000.},
+    'XETHZEUR': {'altname': 'ETHEUR', 'wsname': 'ETH/EUR', 'base': 'XETH',
+                 'quote': 'ZEUR', 'pair_decimals': 2, 'lot_decimals': 8,
+                 'ordermin': '0.002', 'price': 2000.},
+}
+
+# private methods counting 2 towards the API counter
+LEDGER_METHODS = ['ClosedOrders', 'Ledgers', 'QueryLedgers', 'TradesHistory',
+                  'QueryTrades']
+
+# private methods not counting towards the API counter
+ORDER_METHODS = ['AddOrder', 'CancelOrder']
+
+# API counter (limit, seconds per decrement) per tier
+TIERS = {2: (15, 3), 3: (20, 2), 4: (20, 1)}
+
+
+class SimulatedAPI(object):
+    """Simulated Kraken exchange, a drop-in replacement of ``krakenex.API``.
+
+    Serves the public methods Time, Assets, AssetPairs, Ticker, Depth, Trades,
+    Spread and OHLC, and the private methods AddOrder, CancelOrder,
+    OpenOrders and ClosedOrders, in the format of the Kraken API.
+
+    The market advances in steps of ``tick`` seconds (computed lazily, on
+    queries): the mid price of each pair follows a random walk (or the given
+    ``prices``), the order book is regenerated around it, and random market
+    trades are generated. Market orders (and marketable limit orders) fill
+    immediately against the book; resting limit orders fill completely at
+    their limit price once the market trades through them. Orders do not
+    affect the simulated book.
+
+    Like Kraken, the simulator rejects private queries exceeding the API
+    counter of the given tier ("EAPI:Rate limit exceeded"), orders exceeding
+    the per pair order rate counter ("EOrder:Rate limit exceeded"), public
+    queries exceeding ``public_rate`` ("EGeneral:Too many requests") and
+    nonces not increasing beyond ``nonce_window`` ("EAPI:Invalid nonce").
+
+    Parameters
+    ----------
+    pairs : dict, optional (default=None)
+        Asset pairs, as name -> specification (altname, wsname, base, quote,
+        pair_decimals, lot_decimals, ordermin and the initial price). If None
+        (default), XXBTZEUR and XETHZEUR.
+
+    prices : dict, optional (default=None)
+        Replayed mid prices, as name -> array of prices, one per step (the
+        last price is kept once exhausted). Pairs without prices follow a
+        random walk.
+
+    tick : float, optional (default=1)
+        Seconds per market step.
+
+    volatility : float, optional (default=1e-4)
+        Standard deviation of the relative mid price change per step.
+
+    depth : int, optional (default=500)
+        Number of price levels per side of the order book.
+
+    latency : float, optional (default=0)
+        Seconds each query sleeps (outside of any lock), to simulate the
+        round trip time.
+
+    tier : int, optional (default=3)
+        Tier of the API counter of private queries (2, 3 or 4); 0 disables
+        it.
+
+    order_limit : float, optional (default=None)
+        Per pair order rate counter threshold. The counter decreases by
+        ``order_decay`` per second. If None (default), the threshold of
+        ``tier`` that ``KrakenAPI`` paces orders to (none for tier 0, which
+        disables the counter).
+
+    order_decay : float, optional (default=None)
+        See ``order_limit``. If None (default), the decrease of ``tier``.
+
+    public_rate : float, optional (default=None)
+        Maximum sustained number of public queries per second (with bursts
+        of up to ``public_burst`` queries). If None (default), unlimited.
+
+    public_burst : int, optional (default=15)
+        See ``public_rate``.
+
+    nonce_window : int, optional (default=0)
+        Accept nonces up to ``nonce_window`` lower than the highest nonce
+        seen (but never the same nonce twice).
+
+    skew : float, optional (default=0)
+        Seconds the server clock is ahead of the local clock.
+
+    seed : int, optional (default=None)
+        Seed of the random market.
+
+    Examples
+    --------
+    >>> from pykrakenapi import KrakenAPI
+    >>> from pykrakenapi.simulator import SimulatedAPI
+    >>> k = KrakenAPI(SimulatedAPI(latency=.05, seed=0))
+    >>> ohlc, last = k.get_ohlc_data('XBTEUR')
+    >>> k.add_standard_order('XBTEUR', 'buy', 'market', '0.1', validate=False)
+
+    """
+
+    def __init__(self, pairs=None, prices=None, tick=1, volatility=1e-4,
+                 depth=500, latency=0, tier=3, order_limit=None,
+                 order_decay=None, public_rate=None, public_burst=15,
+                 nonce_window=0, skew=0, seed=None):
+
+        self.pairs = dict(PAIRS if pairs is None else pairs)
+        self.prices = {pair: np.asarray(p, dtype=float)
+                       for pair, p in (prices or {}).items()}
+        self.tick = tick
+        self.volatility = volatility
+        self.depth = depth
+        self.latency = latency
+        self.tier = tier
+        # per pair order rate limits of KrakenAPI (of the same tier)
+        limit, decay = _ORDER_RATE_LIMITS.get(tier, (None, 0.))
+        self.order_limit = limit if order_limit is None else order_limit
+        self.order_decay = decay if order_decay is None else order_decay
+        self.public_rate = public_rate
+        self.public_burst = public_burst
+        self.nonce_window = nonce_window
+        self.skew = skew
+
+        self.key = 'simulated'
+        self.secret = 'simulated'
+
+        self._rng = np.random.RandomState(seed)
+        self._lock = threading.Lock()
+
+        # names of pairs
+        self._names = {}
+        for pair, spec in self.pairs.items():
+            for name in (pair, spec.get('altname'), spec.get('wsname')):
+                if name is not None:
+                    self._names[name.upper()] = pair
+
+        # market
+        now = self._now()
+        self._step = 0
+        self._stepped = now
+        self._markets = {}
+        for pair, spec in self.pairs.items():
+            market = {
+                'mid': self._price(pair, 0, spec['price']),
+                'trades': collections.deque(maxlen=100000),
+                'spreads': collections.deque(maxlen=100000),
+                'open': spec['price'],
+            }
+            self._markets[pair] = market
+            self._build_book(pair, now)
+
+        # orders
+        self._orders = collections.OrderedDict()
+        self._open = set()
+        self._ntxids = 0
+
+        # rate limits
+        self._api_counter = 0.
+        self._api_updated = now
+        self._order_counters = {}
+        self._public_tokens = float(public_burst)
+        self._public_updated = now
+        self._nonces = collections.deque(maxlen=1000)
+        self._max_nonce = 0
+
+    # transport interface (see krakenex.API)
+
+    def query_public(self, method, data=None, timeout=None):
+
+        if data is None:
+            data = {}
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self._lock:
+            now = self._now()
+            self._advance(now)
+            if not self._public_allowed(now):
+                return {'error': ['EGeneral:Too many requests']}
+            handler = getattr(self, '_public_{}'.format(method.lower()),
+                              None)
+            if handler is None:
+                return {'error': ['EGeneral:Unknown method']}
+            return self._handle(handler, data, now)
+
+    def query_private(self, method, data=None, timeout=None):
+
+        if data is None:
+            data = {}
+        data['nonce'] = self._nonce()
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self._lock:
+            now = self._now()
+            self._advance(now)
+            if not self._nonce_allowed(int(data['nonce'])):
+                return {'error': ['EAPI:Invalid nonce']}
+            if not self._api_allowed(method, now):
+                return {'error': ['EAPI:Rate limit exceeded']}
+            handler = getattr(self, '_private_{}'.format(method.lower()),
+                              None)
+            if handler is None:
+                return {'error': ['EGeneral:Unknown method']}
+            return self._handle(handler, data, now)
+
+    def _nonce(self):
+
+        return int(1000*time.time())
+
+    def _handle(self, handler, data, now):
+
+        try:
+            result = handler(data, now)
+        except _SimulatedError as err:
+            return {'error': [str(err)]}
+
+        return {'error': [], 'result': result}
+
+    # public methods
+
+    def _public_time(self, data, now):
+
+        return {'unixtime': int(now),
+                'rfc1123': email.utils.formatdate(now, usegmt=True)}
+
+    def _public_assets(self, data, now):
+
+        assets = {}
+        for spec in self.pairs.values():
+            for asset in (spec['base'], spec['quote']):
+                assets[asset] = {'aclass': 'currency', 'altname': asset[1:]
+                                 if len(asset) == 4 else asset,
+                                 'decimals': 10, 'display_decimals': 5}
+
+        return self._filter(assets, data.get('asset'))
+
+    def _public_assetpairs(self, data, now):
+
+        pairs = {}
+        for pair, spec in self.pairs.items():
+            pairs[pair] = {key: value for key, value in spec.items()
+                           if key != 'price'}
+            pairs[pair].setdefault('status', 'online')
+
+        return self._filter(pairs, data.get('pair'))
+
+    def _public_ticker(self, data, now):
+
+        ticker = {}
+        for pair in data.get('pair', '').split(','):
+            pair = self._pair(pair)
+            market = self._markets[pair]
+            fmt = self._fmt(pair)
+            trades = [trade for trade in market['trades']
+                      if trade[2] > now - 86400]
+            # before the first trade, low, high and vwap are the open price
+            prices = np.array([trade[0] for trade in trades] or
+                              [market['open']])
+            volumes = np.array([trade[1] for trade in trades] or [0.])
+            last = trades[-1] if trades else (market['mid'], 0., now)
+            if volumes.sum() > 0:
+                vwap = (prices * volumes).sum() / volumes.sum()
+            else:
+                vwap = prices.mean()
+            ask, bid = market['asks'][0], market['bids'][0]
+            ticker[pair] = {
+                'a': [fmt(ask[0]), '1', '{:.3f}'.format(ask[1])],
+                'b': [fmt(bid[0]), '1', '{:.3f}'.format(bid[1])],
+                'c': [fmt(last[0]), '{:.8f}'.format(last[1])],
+                'v': ['{:.8f}'.format(volumes.sum())] * 2,
+                'p': [fmt(vwap)] * 2,
+                't': [len(trades)] * 2,
+                'l': [fmt(prices.min())] * 2,
+                'h': [fmt(prices.max())] * 2,
+                'o': fmt(market['open']),
+            }
+
+        return ticker
+
+    def _public_depth(self, data, now):
+
+        pair = self._pair(data.get('pair'))
+        market = self._markets[pair]
+        count = int(data.get('count', 100))
+        fmt = self._fmt(pair)
+
+        book = {side: [[fmt(price), '{:.3f}'.format(volume), ts]
+                       for price, volume, ts in market[side][:count]]
+                for side in ('asks', 'bids')}
+
+        return {pair: book}
+
+    def _public_trades(self, data, now):
+
+        pair = self._pair(data.get('pair'))
+        market = self._markets[pair]
+        fmt = self._fmt(pair)
+        # since in nanoseconds (or seconds)
+        since = float(data.get('since', 0))
+        if since > 1e12:
+            since /= 1e9
+
+        trades = [trade for trade in market['trades'] if trade[2] > since]
+        trades = trades[:1000]
+        last = trades[-1][2] if trades else max(since, 0)
+
+        return {pair: [[fmt(price), '{:.8f}'.format(volume), ts, side, kind,
+                        ''] for price, volume, ts, side, kind in trades],
+                'last': str(int(last * 1e9))}
+
+    def _public_spread(self, data, now):
+
+        pair = self._pair(data.get('pair'))
+        market = self._markets[pair]
+        fmt = self._fmt(pair)
+        since = int(data.get('since', 0))
+
+        spreads = [spread for spread in market['spreads']
+                   if spread[0] >= since]
+        last = spreads[-1][0] if spreads else since
+
+        return {pair: [[ts, fmt(bid), fmt(ask)] for ts, bid, ask in spreads],
+                'last': last}
+
+    def _public_ohlc(self, data, now):
+
+        pair = self._pair(data.get('pair'))
+        market = self._markets[pair]
+        fmt = self._fmt(pair)
+        interval = int(data.get('interval', 1)) * 60
+        since = int(data.get('since', 0))
+
+        # aggregate trades of the last 720 intervals into bars
+        trades = np.array([trade[:3] for trade in market['trades']],
+                          dtype=float).reshape(-1, 3)
+        start = max(since // interval * interval,
+                    (int(now) // interval - 719) * interval)
+        trades = trades[trades[:, 2] >= start]
+        bins = (trades[:, 2] // interval * interval).astype(int)
+
+        ohlc = []
+        for t in np.unique(bins):
+            price, volume = trades[bins == t, 0], trades[bins == t, 1]
+            ohlc.append([int(t), fmt(price[0]), fmt(price.max()),
+                         fmt(price.min()), fmt(price[-1]),
+                         fmt((price * volume).sum() / volume.sum()),
+                         '{:.8f}'.format(volume.sum()), len(price)])
+        last = ohlc[-2][0] if len(ohlc) > 1 else start
+
+        return {pair: ohlc, 'last': last}
+
+    # private methods
+
+    def _private_addorder(self, data, now):
+
+        pair = self._pair(data.get('pair'))
+        spec = self.pairs[pair]
+        side, ordertype = data.get('type'), data.get('ordertype')
+        if side not in ('buy', 'sell'):
+            raise _SimulatedError('EGeneral:Invalid arguments:type')
+        if ordertype not in ('market', 'limit'):
+            raise _SimulatedError('EGeneral:Invalid arguments:ordertype')
+        volume = float(data.get('volume', 0))
+        if volume < float(spec.get('ordermin', 0)):
+            raise _SimulatedError('EOrder:Order minimum not met')
+        price = data.get('price')
+        if ordertype == 'limit':
+            if price is None:
+                raise _SimulatedError('EGeneral:Invalid arguments:price')
+            price = float(price)
+
+        fmt = self._fmt(pair)
+        descr = '{} {:.8f} {} @ {}'.format(
+            side, volume, spec.get('altname', pair),
+            'market' if ordertype == 'market' else 'limit ' + fmt(price))
+        if str(data.get('validate', 'false')).lower() == 'true':
+            return {'descr': {'order': descr}}
+
+        if not self._order_allowed(pair, 1, now):
+            raise _SimulatedError('EOrder:Rate limit exceeded')
+
+        self._ntxids += 1
+        txid = 'OSIMUL-{:05d}-{:06d}'.format(
+            self._ntxids // 1000000, self._ntxids % 1000000)
+        order = {
+            'refid': None, 'userref': int(data.get('userref', 0)),
+            'status': 'open', 'opentm': now, 'starttm': 0, 'expiretm': 0,
+            'descr': {'pair': spec.get('altname', pair), 'type': side,
+                      'ordertype': ordertype,
+                      'price': fmt(price) if price is not None else '0',
+                      'price2': '0', 'leverage': 'none', 'order': descr,
+                      'close': ''},
+            'vol': '{:.8f}'.format(volume), 'vol_exec': '0.00000000',
+            'cost': '0', 'fee': '0', 'price': '0', 'stopprice': '0',
+            'limitprice': '0', 'misc': '', 'oflags': data.get('oflags', ''),
+        }
+        self._orders[txid] = order
+        self._open.add(txid)
+
+        # take liquidity
+        book = self._markets[pair]['bids' if side == 'sell' else 'asks']
+        best = book[0][0]
+        if ordertype == 'market' or (
+                (side == 'buy' and price >= best) or
+                (side == 'sell' and price <= best)):
+            fill = self._walk(book, volume)
+            if ordertype == 'limit':
+                fill = min(fill, price) if side == 'buy' else max(fill,
+                                                                  price)
+            self._fill(txid, fill, now, fee=.0026)
+
+        return {'descr': {'order': descr}, 'txid': [txid]}
+
+    def _private_cancelorder(self, data, now):
+
+        txid = str(data.get('txid'))
+        if txid in self._orders:
+            txids = [txid]
+        else:
+            txids = [t for t in self._open
+                     if str(self._orders[t]['userref']) == txid]
+        txids = [t for t in txids if t in self._open]
+        if len(txids) == 0:
+            raise _SimulatedError('EOrder:Unknown order')
+
+        # cancelling young orders costs a penalty (the one KrakenAPI paces
+        # cancellations by)
+        for t in txids:
+            order = self._orders[t]
+            age = now - order['opentm']
+            penalty = next((penalty for limit, penalty in _CANCEL_PENALTIES
+                            if age < limit), 0)
+            pair = self._pair(order['descr']['pair'])
+            if not self._order_allowed(pair, penalty, now):
+                raise _SimulatedError('EOrder:Rate limit exceeded')
+            self._close(t, 'canceled', now, reason='User requested')
+
+        return {'count': len(txids), 'pending': False}
+
+    def _private_openorders(self, data, now):
+
+        userref = data.get('userref')
+        openorders = {txid: dict(order) for txid, order in
+                      self._orders.items() if txid in self._open and
+                      (userref is None or
+                       str(order['userref']) == str(userref))}
+
+        return {'open': openorders}
+
+    def _private_closedorders(self, data, now):
+
+        userref = data.get('userref')
+        start = float(data.get('start', 0))
+        end = float(data.get('end', float('inf')))
+        ofs = int(data.get('ofs', 0))
+        closetime = data.get('closetime', 'both')
+
+        closed = []
+        for txid, order in self._orders.items():
+            if txid in self._open:
+                continue
+            if userref is not None and str(order['userref']) != str(userref):
+                continue
+            if closetime == 'open':
+                times = [order['opentm']]
+            elif closetime == 'close':
+                times = [order['closetm']]
+            else:
+                times = [order['opentm'], order['closetm']]
+            if any(start < t <= end for t in times):
+                closed.append((txid, order))
+
+        # most recent first
+        closed.sort(key=lambda item: -item[1]['closetm'])
+
+        return {'closed': {txid: dict(order) for txid, order in
+                           closed[ofs:ofs + 50]},
+                'count': len(closed)}
+
+    # market
+
+    def _now(self):
+
+        return time.time() + self.skew
+
+    def _price(self, pair, step, default):
+
+        prices = self.prices.get(pair)
+        if prices is None or len(prices) == 0:
+            return default
+
+        return prices[min(step, len(prices) - 1)]
+
+    def _advance(self, now):
+
+        steps = int((now - self._stepped) / self.tick)
+        if steps <= 0:
+            return
+
+        # do not simulate more than 1000 steps at once
+        for i in range(max(steps - 1000, 0), steps):
+            ts = self._stepped + (i + 1) * self.tick
+            self._step += 1
+            for pair in self.pairs:
+                self._step_market(pair, ts)
+        self._stepped += steps * self.tick
+
+    def _step_market(self, pair, ts):
+
+        market = self._markets[pair]
+        rng = self._rng
+
+        # mid price
+        if pair in self.prices:
+            market['mid'] = self._price(pair, self._step, market['mid'])
+        else:
+            market['mid'] *= np.exp(self.volatility * rng.randn())
+        self._build_book(pair, ts)
+
+        # random trades
+        for _ in range(rng.poisson(1.)):
+            side = 'b' if rng.rand() < .5 else 's'
+            book = market['asks' if side == 'b' else 'bids']
+            volume = float(rng.exponential(.1))
+            price = self._walk(book, volume)
+            market['trades'].append(
+                (price, volume, ts + rng.rand() * self.tick, side, 'm'))
+
+        # resting limit orders traded through
+        low = min(market['asks'][0][0], market['bids'][0][0])
+        high = max(market['asks'][0][0], market['bids'][0][0])
+        for txid in list(self._open):
+            order = self._orders[txid]
+            if self._pair(order['descr']['pair']) != pair:
+                continue
+            price = float(order['descr']['price'])
+            if ((order['descr']['type'] == 'buy' and price >= high) or
+                    (order['descr']['type'] == 'sell' and price <= low)):
+                self._fill(txid, price, ts, fee=.0016)
+
+    def _build_book(self, pair, ts):
+
+        market = self._markets[pair]
+        rng = self._rng
+        decimals = int(self.pairs[pair].get('pair_decimals', 2))
+        step = 10. ** -decimals
+        mid = market['mid']
+
+        # levels one tick (at least) apart, random volumes
+        offsets = np.cumsum(1 + rng.poisson(2., self.depth)) * step
+        best_ask = np.ceil(mid * (1 + 5e-5) / step) * step
+        best_bid = np.floor(mid * (1 - 5e-5) / step) * step
+        volumes = rng.exponential(1., (2, self.depth))
+        times = int(ts) - rng.randint(0, 60, (2, self.depth))
+
+        market['asks'] = list(zip(best_ask + offsets - offsets[0],
+                                  volumes[0], times[0].tolist()))
+        market['bids'] = list(zip(best_bid - offsets + offsets[0],
+                                  volumes[1], times[1].tolist()))
+        market['spreads'].append((int(ts), best_bid, best_ask))
+
+    def _walk(self, book, volume):
+
+        # average price of a volume taken from the book
+        remaining, notional = volume, 0.
+        for price, available, _ in book:
+            take = min(remaining, available)
+            notional += take * price
+            remaining -= take
+            if remaining <= 0:
+                break
+        if remaining > 0:
+            notional += remaining * book[-1][0]
+
+        return notional / volume if volume > 0 else book[0][0]
+
+    # orders
+
+    def _fill(self, txid, price, now, fee):
+
+        order = self._orders[txid]
+        volume = float(order['vol'])
+        cost = price * volume
+        order.update({
+            'vol_exec': order['vol'], 'price': '{:.8f}'.format(price),
+            'cost': '{:.8f}'.format(cost),
+            'fee': '{:.8f}'.format(cost * fee)})
+        self._close(txid, 'closed', now)
+
+        pair = self._pair(order['descr']['pair'])
+        self._markets[pair]['trades'].append(
+            (price, volume, now, order['descr']['type'][0],
+             'm' if order['descr']['ordertype'] == 'market' else 'l'))
+
+    def _close(self, txid, status, now, reason=None):
+
+        order = self._orders[txid]
+        order.update({'status': status, 'closetm': now, 'reason': reason})
+        self._open.discard(txid)
+
+    # rate limits
+
+    def _nonce_allowed(self, nonce):
+
+        # never the same nonce twice, never below the window
+        if (nonce in self._nonces or
+                nonce < self._max_nonce - self.nonce_window):
+            return False
+        self._nonces.append(nonce)
+        self._max_nonce = max(self._max_nonce, nonce)
+
+        return True
+
+    def _api_allowed(self, method, now):
+
+        if self.tier == 0 or method in ORDER_METHODS:
+            return True
+
+        limit, factor = TIERS[self.tier]
+        self._api_counter = max(
+            0., self._api_counter - (now - self._api_updated) / factor)
+        self._api_updated = now
+        incr = 2 if method in LEDGER_METHODS else 1
+        if self._api_counter + incr > limit:
+            return False
+        self._api_counter += incr
+
+        return True
+
+    def _order_allowed(self, pair, incr, now):
+
+        if self.order_limit is None:
+            return True
+
+        counter, updated = self._order_counters.get(pair, (0., now))
+        counter = max(0., counter - (now - updated) * self.order_decay)
+        if counter + incr > self.order_limit:
+            self._order_counters[pair] = (counter, now)
+            return False
+        self._order_counters[pair] = (counter + incr, now)
+
+        return True
+
+    def _public_allowed(self, now):
+
+        if self.public_rate is None:
+            return True
+
+        self._public_tokens = min(
+            float(self.public_burst), self._public_tokens +
+            (now - self._public_updated) * self.public_rate)
+        self._public_updated = now
+        if self._public_tokens < 1:
+            return False
+        self._public_tokens -= 1
+
+        return True
+
+    # helpers
+
+    def _pair(self, name):
+
+        try:
+            return self._names[str(name).upper()]
+        except KeyError:
+            raise _SimulatedError('EQuery:Unknown asset pair')
+
+    def _fmt(self, pair):
+
+        decimals = int(self.pairs[pair].get('pair_decimals', 2))
+
+        return lambda price: '{:.{}f}'.format(price, decimals)
+
+    def _filter(self, items, names):
+
+        if names is None:
+            return items
+        names = [name.upper() for name in names.split(',')]
+
+        return {key: value for key, value in items.items()
+                if key.upper() in names or
+                str(value.get('altname', '')).upper() in names}
+
+
+class _SimulatedError(Exception):
+    pass
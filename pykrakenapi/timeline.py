@@ -0,0 +1,278 @@
+# This file is part of pykrakenapi.
+#
+# pykrakenapi is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pykrakenapi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser
+# General Public LICENSE along with pykrakenapi. If not, see
+# <http://www.gnu.org/licenses/lgpl-3.0.txt> and
+# <http://www.gnu.org/licenses/gpl-3.0.txt>.
+
+"""Latency timelines of API calls.
+
+This module contains the class ``Timeline``, which records high resolution
+timestamps of the phases of API calls (see ``timeline`` and ``profile`` in
+``KrakenAPI``), and summarizes their durations.
+
+>>> help(Timeline)
+
+"""
+
+import collections
+import random
+import threading
+import time
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+
+# phases, as (name, first mark, last mark)
+PHASES = [
+    ('limiter', 'start', 'nonce'),
+    ('sign', 'nonce', 'send'),
+    ('network', 'send', 'headers'),
+    ('transfer', 'headers', 'received'),
+    ('decode', 'received', 'decoded'),
+    ('parse', 'decoded', 'end'),
+    ('total', 'start', 'end'),
+]
+
+
+class Timeline(object):
+    """Recorder of the phases of API calls.
+
+    Records, per call, high resolution timestamps (``time.perf_counter``) at
+    the boundaries of the following phases:
+
+    limiter
+        From the call to the allocation of the nonce: call rate limiter
+        (sleeps and retries included) and preparation of the query.
+
+    sign
+        Allocation of the nonce and signing of the query.
+
+    network
+        From sending the query to receiving the response headers
+        (``response.elapsed``): network round trip and Kraken processing.
+
+    transfer
+        Download of the response body.
+
+    decode
+        JSON decoding of the response.
+
+    parse
+        From the decoded response to the returned result: error checks and
+        conversion (e.g. to DataFrames).
+
+    Timestamps are kept per thread, so that concurrent calls (see
+    ``KrakenAPI.parallel`` and ``KrakenAPI.add_standard_orders``) are
+    recorded separately. Calls nested in a call (e.g. the query of the
+    tradable asset pairs to resolve a pair name) are recorded separately as
+    well, their durations are part of the phases of the outer call. Phases
+    of transports that do not expose the corresponding hooks (e.g. no
+    ``requests`` session) are recorded as nan.
+
+    Parameters
+    ----------
+    maxlen : int, optional (default=100000)
+        Maximum number of calls kept (the most recent ones).
+
+    callback : callable, optional (default=None)
+        Called with the record of each call (a dict, see ``to_frame``) when
+        it ends, e.g. to log it.
+
+    sample : float, optional (default=1)
+        Fraction of calls recorded, chosen at random (e.g. .01 to record one
+        call in a hundred). If 1 (default), record all calls.
+
+    Examples
+    --------
+    >>> import krakenex
+    >>> from pykrakenapi import KrakenAPI, Timeline
+    >>> timeline = Timeline()
+    >>> k = KrakenAPI(krakenex.API(), timeline=timeline)
+    >>> res = k.add_standard_order('XXBTZEUR', 'buy', 'limit', '0.01',
+    ...                            price='1000', userref=42)
+    >>> timeline.percentiles()
+
+    Profile the phases of every call (see ``profile`` in ``KrakenAPI``), and
+    print one in a hundred:
+
+    >>> profile = Timeline(callback=print, sample=.01)
+    >>> k = KrakenAPI(krakenex.API(), profile=profile)
+    >>> closed, count = k.get_closed_orders()
+    >>> profile.percentiles(method='get_closed_orders')
+
+    """
+
+    marks = ['start', 'nonce', 'send', 'headers', 'received', 'decoded',
+             'end']
+
+    def __init__(self, maxlen=100000, callback=None, sample=1):
+
+        self.records = collections.deque(maxlen=maxlen)
+        self.callback = callback
+        self.sample = sample
+
+        self._local = threading.local()
+
+    def begin(self, method, key=None):
+        """Start recording a call of ``method``, identified by ``key``."""
+
+        # calls of a thread are nested (e.g. a query resolving a pair name
+        # queries the tradable asset pairs), marks belong to the innermost
+        calls = self._calls()
+        if self.sample < 1 and random.random() >= self.sample:
+            calls.append(None)
+            return
+
+        calls.append({'method': method, 'key': key, 'time': time.time(),
+                      'start': time.perf_counter()})
+
+    def mark(self, mark, timestamp=None):
+        """Record the timestamp of a mark of the current call (if any)."""
+
+        calls = self._calls()
+        if len(calls) > 0 and calls[-1] is not None:
+            calls[-1][mark] = (time.perf_counter() if timestamp is None else
+                               timestamp)
+
+    def end(self, error=None):
+        """Stop recording the current call, return its record."""
+
+        calls = self._calls()
+        call = calls.pop() if len(calls) > 0 else None
+        if call is None:
+            return None
+
+        call['end'] = time.perf_counter()
+        record = {'method': call['method'], 'key': call['key'],
+                  'time': call['time'], 'error': error}
+        for phase, first, last in PHASES:
+            record[phase] = call.get(last, np.nan) - call.get(first, np.nan)
+        self.records.append(record)
+
+        if self.callback is not None:
+            self.callback(record)
+
+        return record
+
+    def to_frame(self):
+        """Return the recorded calls.
+
+        Returns
+        -------
+        calls : pd.DataFrame
+            method = called method
+            key = key of the call (e.g. the userref of an order)
+            time = unixtime of the call
+            error = error message (if the call failed)
+            limiter, sign, network, transfer, decode, parse, total = duration
+                of each phase in seconds
+
+        """
+
+        return pd.DataFrame(
+            list(self.records),
+            columns=['method', 'key', 'time', 'error'] +
+            [phase for phase, _, _ in PHASES])
+
+    def percentiles(self, q=(50, 90, 99, 99.9), method=None):
+        """Return percentiles of the duration of each phase.
+
+        Parameters
+        ----------
+        q : iterable of float, optional (default=(50, 90, 99, 99.9))
+            Percentiles to compute.
+
+        method : str, optional (default=None)
+            Only include calls of this method. If None, all calls.
+
+        Returns
+        -------
+        percentiles : pd.DataFrame
+            index = phase
+            columns = percentiles (and the number of calls), in seconds
+
+        """
+
+        calls = self.to_frame()
+        if method is not None:
+            calls = calls[calls.method == method]
+        phases = [phase for phase, _, _ in PHASES]
+
+        percentiles = calls[phases].quantile(
+            [p / 100 for p in q]).T
+        percentiles.columns = ['p{}'.format(p) for p in q]
+        percentiles['count'] = calls[phases].count()
+
+        return percentiles
+
+    def clear(self):
+        """Drop all recorded calls."""
+
+        self.records.clear()
+
+    def instrument(self, api):
+        """Install marks in the nonce, session and query hooks of api.
+
+        Hooks missing on ``api`` (e.g. of transports other than
+        ``krakenex.API``) are skipped.
+
+        """
+
+        if hasattr(api, '_nonce'):
+            api._nonce = self._marked(api._nonce, 'nonce', None)
+        if hasattr(api, '_query'):
+            api._query = self._marked(api._query, None, 'decoded')
+
+        session = getattr(api, 'session', None)
+        if session is not None:
+            session.get = self._sent(session.get)
+            session.post = self._sent(session.post)
+
+    def _calls(self):
+
+        calls = getattr(self._local, 'calls', None)
+        if calls is None:
+            calls = self._local.calls = []
+
+        return calls
+
+    def _marked(self, func, before, after):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if before is not None:
+                self.mark(before)
+            result = func(*args, **kwargs)
+            if after is not None:
+                self.mark(after)
+            return result
+
+        return wrapper
+
+    def _sent(self, func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            send = time.perf_counter()
+            self.mark('send', send)
+            response = func(*args, **kwargs)
+            elapsed = getattr(response, 'elapsed', None)
+            if elapsed is not None:
+                self.mark('headers', send + elapsed.total_seconds())
+            self.mark('received')
+            return response
+
+        return wrapper
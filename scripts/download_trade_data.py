@@ -1,22 +1,54 @@
 """
-Download trade data for a kraken asset pair. Updates can be downloaded by
+Download trade data for kraken asset pairs. Updates can be downloaded by
 simply calling this script again.
 
+Several pairs can be given at once, e.g. ``--pair XXBTZEUR XETHZEUR``, or
+``--pair all`` for all tradable asset pairs. Their trade data is downloaded by
+``workers`` threads that share one call rate limiter (see ``tier``, which must
+be given for more than one worker). Pairs are served round robin, one page of
+trades at a time, so that all pairs progress at the same rate.
+
 Data is stored as pandas.DataFrame's (in "unixtimestamp.pickle" format).
 Use pd.read_pickle(file) to load data into memory.
 
+Every page of trades is written to a temporary file first and then renamed,
+and recorded in "manifest.jsonl" (one line per page, with the ``since`` and
+``last`` values of the query). Downloads resume from the manifest. Trades
+repeated at page boundaries are dropped. Use the ``check`` flag to verify
+the downloaded pages, and to refetch only the ranges of missing, corrupt or
+skipped pages.
+
 Use the ``interval`` argument to sample trade data into ohlc format instead of
 downloading/updating trade data (in that case, only the arguments ``folder``,
 ``pair`` and ``interval`` have an effect). Data is stored as a pandas.DataFrame
-(in "pair_interval.pickle" format).
+(in "pair_interval.pickle" format). Several intervals can be given at once,
+e.g. ``--interval 1 5 15 60 1440``. The trade data is then sampled only once,
+into bars of the finest common interval, which are rolled up into the coarser
+intervals.
+
+Trade data is aggregated in chunks of ``chunksize`` trades, in chronological
+order, so that the memory needed does not grow with the size of the trade
+history (only with the size of the resulting ohlc data).
+
+Use the ``incremental`` flag to only aggregate trade data that was downloaded
+since the last aggregation, including trades added to the last page (which is
+downloaded again by updates). The last (possibly incomplete) bar is reopened
+and merged with the new trades, all other bars are kept as they are. The state
+of the last aggregation is stored in "pair_interval.checkpoint".
 
 """
 
 import argparse
+import json
 import os
+import queue
+import threading
+from functools import reduce
+from math import gcd
 from pathlib import Path
 import pytz
 
+import numpy as np
 import pandas as pd
 import krakenex
 from pykrakenapi import KrakenAPI
@@ -37,10 +69,12 @@ parser.add_argument(
 
 parser.add_argument(
     '--pair',
-    help=('asset pair to get trade data for. '
+    help=('asset pair(s) to get trade data for, or "all" for all tradable '
+          'asset pairs. '
           'see KrakenAPI(api).get_tradable_asset_pairs().index.values'),
     type=str,
-    default='XXBTZEUR')
+    nargs='+',
+    default=['XXBTZEUR'])
 
 parser.add_argument(
     '--since',
@@ -61,28 +95,80 @@ parser.add_argument(
 parser.add_argument(
     '--interval',
     help=('sample downloaded trade data to ohlc format with the given time '
-          'interval (minutes). If 0 (default), only download/update trade '
+          'interval(s) (minutes). If 0 (default), only download/update trade '
           'data.'),
     type=int,
+    nargs='+',
+    default=[0])
+
+parser.add_argument(
+    '--incremental',
+    help=('only aggregate trade data downloaded since the last aggregation '
+          'and append it to the stored ohlc data. Falls back to a full '
+          'aggregation if there is no (valid) checkpoint.'),
+    action='store_true')
+
+parser.add_argument(
+    '--check',
+    help=('check downloaded trade data for missing or corrupt pages and gaps '
+          'between pages, and refetch the missing ranges before '
+          'downloading/updating trade data.'),
+    action='store_true')
+
+parser.add_argument(
+    '--workers',
+    help='number of threads downloading trade data concurrently',
+    type=int,
+    default=1)
+
+parser.add_argument(
+    '--tier',
+    help=('Kraken tier level, used to limit the call rate of all workers '
+          'together. If 0 (default), the call rate limiter is disabled, '
+          'which is only allowed for a single worker.'),
+    type=int,
     default=0)
 
+parser.add_argument(
+    '--chunksize',
+    help=('number of trades to load into memory at once when sampling trade '
+          'data to ohlc format.'),
+    type=int,
+    default=1000000)
+
 # args
 args = parser.parse_args()
 
+if args.interval != [0] and min(args.interval) <= 0:
+    parser.error('argument --interval: intervals must be positive (or a '
+                 'single 0 to download/update trade data)')
+
+if args.workers > 1 and args.tier == 0:
+    parser.error('argument --tier: several workers (--workers {}) need a '
+                 'shared call rate limit, i.e. a tier other than '
+                 '0'.format(args.workers))
+
 folder = args.folder
-pair = args.pair
+pairs = args.pair
 since = args.since
 timezone = args.timezone
-interval = args.interval
+intervals = args.interval
+incremental = args.incremental
+chunksize = args.chunksize
+workers = args.workers
+check = args.check
+tier = args.tier
 
 
 class GetTradeData(object):
 
-    def __init__(self, folder, pair, timezone):
+    def __init__(self, folder, pair, timezone, k=None):
 
-        # initiate api
-        self.api = krakenex.API()
-        self.k = KrakenAPI(self.api, tier=0, retry=.1)
+        # initiate api, unless a (shared) KrakenAPI instance is given
+        if k is None:
+            k = KrakenAPI(krakenex.API(), tier=0, retry=.1)
+        self.api = k.api
+        self.k = k
 
         # set pair
         self.pair = pair
@@ -92,84 +178,503 @@ class GetTradeData(object):
         self.folder = folder
         os.makedirs(self.folder + pair, exist_ok=True)
 
+        # download state
+        self._pages = None
+        self._previous = None
+
     def download_trade_data(self, since):
 
-        folder = self.folder + self.pair + '/'
+        last = self.get_since(since)
+
+        # get data
+        while last is not None:
+            last = self.download_page(last)
+
+    def get_since(self, since):
 
         # update or new download?
-        if since is 0:
-            fs = os.listdir(folder)
-            if len(fs) > 0:
-                fs.sort()
-                last = int(fs[-1].split('.')[0])
+        pages = self._load_manifest()
+        if since == 0:
+            if len(pages) > 0:
+                last = pages[-1]['last']
             else:
                 last = 0
         else:
-            last = since
+            last = int(since)
 
-        # get data
-        while True:
+        return last
+
+    def download_page(self, last, until=None):
+
+        folder = self.folder + self.pair + '/'
+
+        try:
+            fname = '{}.pickle'.format(str(last).zfill(19))
+            since = last
+            trades, last = self.k.get_recent_trades(pair=self.pair,
+                                                    since=since)
+
+            # set timezone
+            index = trades.index.tz_localize(pytz.utc).tz_convert(self.tz)
+            trades.index = index
+
+            # drop trades of the previous page, and (when filling a gap)
+            # trades of the next page
+            trades = self._drop_duplicates(trades, since)
+            if until is not None and int(last) >= until:
+                trades = trades[trades.time * 1e9 <= until]
+                last = until
+
+            # store
+            print('storing', folder + fname)
+            self._write_atomic(folder + fname, trades.to_pickle)
+            self._add_page({
+                'since': int(since),
+                'last': int(last),
+                'file': fname,
+                'count': len(trades),
+                'first_time': float(trades.time.min()),
+                'last_time': float(trades.time.max()),
+            })
+            self._previous = (int(last), trades)
+
+        except CallRateLimitError:
+            print('\n this should not happen. please report an issue on '
+                  'github! thanks. \n')
+            raise
+
+        except ValueError:
+            print('download/update finished! ({})'.format(self.pair))
+            return None
+
+        return last
+
+    def check_trade_data(self):
+
+        folder = self.folder + self.pair + '/'
+
+        # drop pages whose file is missing or cannot be read
+        pages = []
+        for page in self._load_manifest():
             try:
-                fname = folder + '{}.pickle'.format(str(last).zfill(19))
-                trades, last = self.k.get_recent_trades(pair=self.pair,
-                                                        since=last)
+                pd.read_pickle(folder + page['file'])
+                pages.append(page)
+            except Exception:
+                print('missing or corrupt page', folder + page['file'])
+        self._save_manifest(pages)
+
+        # refetch the trades between consecutive pages
+        for prev, page in zip(pages[:-1], pages[1:]):
+            if prev['last'] > page['since']:
+                print('overlapping pages', prev['file'], page['file'])
+                continue
+            last = prev['last']
+            while last is not None and last < page['since']:
+                print('refetching missing trades before', page['file'])
+                last = self.download_page(last, until=page['since'])
+
+        print('check finished! ({})'.format(self.pair))
+
+    def _drop_duplicates(self, trades, since):
+
+        # the page that ended at ``since``
+        prev = self._previous_page(since)
+        if prev is None or len(prev) == 0 or len(trades) == 0:
+            return trades
+
+        # trades before the last trade of the previous page, or equal to one
+        # of the trades at that time
+        last_time = prev.time.max()
+        cols = ['price', 'volume', 'time', 'buy_sell', 'market_limit']
+        seen = set(prev.loc[prev.time.values == last_time, cols].itertuples(
+            index=False, name=None))
+        boundary = trades.time.values == last_time
+        dup = np.zeros(len(trades), dtype=bool)
+        for i, row in zip(np.flatnonzero(boundary), trades.loc[
+                boundary, cols].itertuples(index=False, name=None)):
+            dup[i] = row in seen
+        keep = (trades.time.values > last_time) | (boundary & ~dup)
+
+        if not keep.all():
+            print('dropping {} duplicate trades'.format((~keep).sum()))
+
+        return trades[keep]
+
+    def _previous_page(self, since):
 
-                # set timezone
-                index = trades.index.tz_localize(pytz.utc).tz_convert(self.tz)
-                trades.index = index
+        folder = self.folder + self.pair + '/'
+
+        if self._previous is not None and self._previous[0] == since:
+            return self._previous[1]
+
+        for page in self._load_manifest():
+            if page['last'] == since:
+                return pd.read_pickle(folder + page['file'])
 
-                # store
-                print('storing', fname)
-                trades.to_pickle(fname)
+        return None
 
-            except CallRateLimitError:
-                print('\n this should not happen. please report an issue on '
-                      'github! thanks. \n')
-                raise
+    def _load_manifest(self):
+
+        folder = self.folder + self.pair + '/'
+        mname = folder + 'manifest.jsonl'
+
+        if self._pages is not None:
+            return self._pages
+
+        # remove files of interrupted writes
+        for f in os.listdir(folder):
+            if f.endswith('.tmp'):
+                os.remove(folder + f)
+
+        # one line per page, later lines replace earlier lines of the same
+        # page, an incomplete last line is ignored
+        if os.path.exists(mname):
+            pages = {}
+            with open(mname) as f:
+                for line in f:
+                    try:
+                        page = json.loads(line)
+                    except ValueError:
+                        continue
+                    pages[page['since']] = page
+            self._pages = sorted(pages.values(), key=lambda p: p['since'])
+
+        # trade data downloaded without a manifest
+        else:
+            self._pages = self._build_manifest()
+            self._save_manifest(self._pages)
 
-            except ValueError:
-                print('download/update finished!')
-                break
+        return self._pages
 
-    def agg_ohlc(self, interval):
+    def _build_manifest(self):
 
         folder = self.folder + self.pair + '/'
 
-        # fetch files and convert to dataframe
-        fs = os.listdir(folder)
-        fs.sort(reverse=True)
-        trades = []
+        fs = [f for f in os.listdir(folder) if f.endswith('.pickle')]
+        fs.sort()
+
+        pages = []
         for f in fs:
-            trades.append(pd.read_pickle(folder + f))
-        trades = pd.concat(trades, axis=0)
-        trades.loc[:, 'cost'] = trades.price * trades.volume
+            try:
+                trades = pd.read_pickle(folder + f)
+            except Exception:
+                print('removing corrupt page', folder + f)
+                os.remove(folder + f)
+                continue
+            pages.append({
+                'since': int(f.split('.')[0]),
+                'file': f,
+                'count': len(trades),
+                'first_time': float(trades.time.min()),
+                'last_time': float(trades.time.max()),
+            })
+
+        # each page ends where the next one starts, the last page is
+        # downloaded again
+        for page, next_page in zip(pages, pages[1:] + [None]):
+            if next_page is None:
+                page['last'] = page['since']
+            else:
+                page['last'] = next_page['since']
+
+        return pages
+
+    def _add_page(self, page):
 
-        # resample
-        gtrades = trades.resample('{}min'.format(interval))
+        mname = self.folder + self.pair + '/manifest.jsonl'
+
+        pages = [p for p in self._load_manifest()
+                 if p['since'] != page['since']]
+        pages.append(page)
+        pages.sort(key=lambda p: p['since'])
+        self._pages = pages
+
+        with open(mname, 'a') as f:
+            f.write(json.dumps(page) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _save_manifest(self, pages):
+
+        mname = self.folder + self.pair + '/manifest.jsonl'
+
+        def write(fname):
+            with open(fname, 'w') as f:
+                for page in pages:
+                    f.write(json.dumps(page) + '\n')
+
+        self._write_atomic(mname, write)
+        self._pages = pages
+
+    def _write_atomic(self, fname, write):
+
+        # write to a temporary file, then rename it
+        tmp = fname + '.tmp'
+        write(tmp)
+        os.replace(tmp, fname)
+
+    def agg_ohlc(self, intervals, incremental=False, chunksize=1000000):
+
+        # load previous ohlc data and checkpoints
+        stored = {}
+        groups = {}
+        for interval in intervals:
+            ohlc, checkpoint = None, None
+            if incremental:
+                ohlc, checkpoint = self._load_checkpoint(interval)
+            stored[interval] = ohlc
+            if ohlc is not None:
+                last = (checkpoint['last_file'], checkpoint['last_time'])
+            else:
+                last = ('', None)
+            groups.setdefault(last, []).append(interval)
+
+        # intervals with the same checkpoint are sampled in one pass
+        for (last_file, last_time), group in sorted(
+                groups.items(), key=lambda item: item[0][0]):
+            self._agg_ohlc(sorted(group), stored, last_file, last_time,
+                           chunksize)
+
+    def _agg_ohlc(self, intervals, stored, last_file, last_time, chunksize):
+
+        # trade files not seen by the last aggregation, in chronological
+        # order, and the last file seen (its page is downloaded again, so it
+        # may contain new trades)
+        fs = self._trade_files()
+        nfiles = len(fs)
+        fs = [f for f in fs if f >= last_file]
+
+        # keep the bins of the stored ohlc data and reopen its last bar
+        origins = {}
+        carry = {}
+        done = {}
+        for interval in intervals:
+            ohlc = stored[interval]
+            if ohlc is None:
+                origins[interval] = None
+                carry[interval] = None
+            else:
+                origins[interval] = ohlc.index[0]
+                carry[interval] = self._unfill_bars(ohlc.iloc[-1:])
+            done[interval] = []
+
+        # sample trades chunk by chunk, into bars of the finest common
+        # interval, and roll them up into the coarser intervals
+        base = reduce(gcd, intervals)
+        new_time = None
+        for trades in self._iter_trades(fs, chunksize, last_file, last_time):
+
+            trades['cost'] = trades.price * trades.volume
+            new_time = trades.time.max()
+
+            # bins start at midnight of the day of the first trade
+            for interval in intervals:
+                if origins[interval] is None:
+                    origins[interval] = trades.index.min().normalize()
+
+            sampled = {base: self._sample_bars(
+                trades, base, origin=origins[intervals[0]])}
+            del trades
+
+            for interval in intervals:
+
+                # roll up the coarsest bars the interval is a multiple of
+                if interval not in sampled:
+                    finer = max(i for i in sampled if interval % i == 0)
+                    sampled[interval] = self._resample_bars(
+                        sampled[finer], interval, origin=origins[interval])
+                bars = sampled[interval]
+
+                # complete the bar carried over from the previous chunk
+                if carry[interval] is not None:
+                    bars = pd.concat((carry[interval], bars))
+                    bars = self._resample_bars(
+                        bars, interval, origin=origins[interval])
+
+                # the last bar may continue in the next chunk
+                done[interval].append(bars.iloc[:-1])
+                carry[interval] = bars.iloc[-1:]
+
+        if new_time is None:
+            print('ohlc data is up to date!')
+            return
+
+        for interval in intervals:
+
+            # fill empty bars
+            bars = pd.concat(done[interval] + [carry[interval]])
+            ohlc = self._fill_bars(bars)
+            if stored[interval] is not None:
+                ohlc = pd.concat((stored[interval].iloc[:-1], ohlc))
+
+            # store on disc
+            fname = self.folder + self.pair + '_{}.pickle'.format(interval)
+            print('storing', fname)
+            ohlc.to_pickle(fname)
+
+            # checkpoint
+            checkpoint = {
+                'last_file': fs[-1],
+                'last_time': float(new_time),
+                'ntrades': int(ohlc['count'].sum()),
+                'nfiles': nfiles,
+            }
+            cname = self.folder + self.pair + '_{}.checkpoint'.format(interval)
+            with open(cname, 'w') as f:
+                json.dump(checkpoint, f)
+
+    def _iter_trades(self, fs, chunksize, last_file='', last_time=None):
+
+        folder = self.folder + self.pair + '/'
+
+        # load trade files until a chunk is full, keep only required columns
+        chunk = []
+        ntrades = 0
+        for f in fs:
+            trades = pd.read_pickle(folder + f)[['price', 'volume', 'time']]
+            # of the last file aggregated before, only trades after the last
+            # aggregated trade are new
+            if f == last_file and last_time is not None:
+                trades = trades[trades.time > last_time]
+            if len(trades) == 0:
+                continue
+            chunk.append(trades)
+            ntrades += len(trades)
+            if ntrades >= chunksize:
+                yield pd.concat(chunk, axis=0)
+                chunk = []
+                ntrades = 0
+
+        if len(chunk) > 0:
+            yield pd.concat(chunk, axis=0)
+
+    def _load_checkpoint(self, interval):
+
+        fname = self.folder + self.pair + '_{}.pickle'.format(interval)
+        cname = self.folder + self.pair + '_{}.checkpoint'.format(interval)
+
+        # no previous aggregation
+        if not (os.path.exists(fname) and os.path.exists(cname)):
+            return None, None
+
+        ohlc = pd.read_pickle(fname)
+        with open(cname) as f:
+            checkpoint = json.load(f)
+
+        # the ohlc data was written, but its checkpoint was not
+        if int(ohlc['count'].sum()) != checkpoint['ntrades']:
+            print('checkpoint does not match ohlc data, aggregating all '
+                  'trade data for interval {}'.format(interval))
+            return None, None
+
+        # missing trade data was downloaded after the checkpoint
+        fs = [f for f in self._trade_files() if f <= checkpoint['last_file']]
+        if len(fs) != checkpoint.get('nfiles', len(fs)):
+            print('trade data was added before the checkpoint, aggregating '
+                  'all trade data for interval {}'.format(interval))
+            return None, None
+
+        return ohlc, checkpoint
+
+    def _trade_files(self):
+
+        folder = self.folder + self.pair + '/'
+
+        # trade files, in chronological order
+        fs = [f for f in os.listdir(folder) if f.endswith('.pickle')]
+        fs.sort()
+
+        return fs
+
+    def _sample_bars(self, trades, interval, origin='start_day'):
+
+        # ohlc, volume, cost and count, without filling empty bars
+        gtrades = trades.resample('{}min'.format(interval), origin=origin)
+        bars = gtrades.price.ohlc()
+        bars.loc[:, 'vol'] = gtrades.volume.sum()
+        bars.loc[:, 'cost'] = gtrades.cost.sum()
+        bars.loc[:, 'count'] = gtrades.size()
+
+        return bars
+
+    def _resample_bars(self, bars, interval, origin='start_day'):
+
+        # merge (unfilled) bars into bins of the given interval
+        bars = bars.resample('{}min'.format(interval), origin=origin).agg({
+            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+            'vol': 'sum', 'cost': 'sum', 'count': 'sum'})
+
+        return bars
+
+    def _fill_bars(self, bars):
 
         # ohlc, volume
-        ohlc = gtrades.price.ohlc()
-        ohlc.loc[:, 'vol'] = gtrades.volume.sum()
-        ohlc.vol.fillna(0, inplace=True)
-        closes = ohlc.close.fillna(method='pad')
+        ohlc = bars[['open', 'high', 'low', 'close', 'vol']].copy()
+        closes = ohlc.close.ffill()
         ohlc = ohlc.apply(lambda x: x.fillna(closes))
 
         # vwap
-        ohlc.loc[:, 'vwap'] = gtrades.cost.sum() / ohlc.vol
-        ohlc.vwap.fillna(ohlc.close, inplace=True)
+        ohlc.loc[:, 'vwap'] = bars.cost / bars.vol
+        ohlc.loc[:, 'vwap'] = ohlc.vwap.fillna(ohlc.close)
 
         # count
-        ohlc.loc[:, 'count'] = gtrades.size()
+        ohlc.loc[:, 'count'] = bars['count']
 
-        # store on disc
-        fname = self.folder + self.pair + '_{}.pickle'.format(interval)
-        print('storing', fname)
-        ohlc.to_pickle(fname)
+        return ohlc
+
+    def _unfill_bars(self, ohlc):
+
+        # recover the traded cost of (non-empty) bars
+        bars = ohlc[['open', 'high', 'low', 'close', 'vol']].copy()
+        bars.loc[:, 'cost'] = ohlc.vwap * ohlc.vol
+        bars.loc[:, 'count'] = ohlc['count']
 
+        return bars
 
-dl = GetTradeData(folder, pair, timezone)
 
-if interval == 0:
-    dl.download_trade_data(since)
+def download_trade_data(dls, since, workers):
+
+    # each task downloads one page of trades, then puts its pair back at the
+    # end of the queue
+    tasks = queue.Queue()
+    for dl in dls:
+        tasks.put((dl, dl.get_since(since)))
+
+    errors = []
+
+    def work():
+        while True:
+            dl, last = tasks.get()
+            try:
+                last = dl.download_page(last)
+                if last is not None:
+                    tasks.put((dl, last))
+            except Exception as err:
+                errors.append((dl.pair, err))
+            finally:
+                tasks.task_done()
+
+    for _ in range(workers):
+        threading.Thread(target=work, daemon=True).start()
+    tasks.join()
+
+    for pair, err in errors:
+        print('download/update of {} failed:'.format(pair), repr(err))
+
+
+# one call rate limiter for all pairs
+k = KrakenAPI(krakenex.API(), tier=tier, retry=.1)
+if pairs == ['all']:
+    pairs = [pair for pair in k.get_tradable_asset_pairs().index
+             if not pair.endswith('.d')]
+
+dls = [GetTradeData(folder, pair, timezone, k=k) for pair in pairs]
+
+if intervals == [0]:
+    if check:
+        for dl in dls:
+            dl.check_trade_data()
+    download_trade_data(dls, since, workers)
 else:
-    dl.agg_ohlc(interval)
+    for dl in dls:
+        dl.agg_ohlc(intervals, incremental, chunksize)
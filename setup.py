@@ -29,6 +29,7 @@ setup(
     long_description=open('README.rst').read(),
     python_requires='>=3',
     install_requires=['krakenex>=2.0.0',
+                      'numpy',
                       'pandas'],
     license="GNU GPL",
     classifiers=[